@@ -1,83 +1,141 @@
-{ pkgs ? (import <nixpkgs> { }) }:
+{ pkgs ? (import <nixpkgs> { })
+  # queue, table and mappings for lambdaplatform.deferred, its queue is polled even when idle
+, deferredExecution ? false }:
 let
 
-  baseInterpreter = pkgs.python3;
-
-  # modification of python packages in nixpkgs
-  pyPackageOverrides = self: super: { };
-
-  # inclusion of python packages in nixpkgs
-  pyPackages = ps: with ps; [ ];
-
-  # addition of python packages not included in nixpkgs
-  pyPackageExtras = ps:
-    with ps; rec {
-      awacs = (buildPythonPackage rec {
-        pname = "awacs";
-        version = "1.0.4";
-        src = fetchPypi {
-          inherit pname version;
-          sha256 =
-            "ed17fb00b5c6e571af67c7e301862d2da8a9b8e389270e4911cb7daf373ea71a";
-        };
-        postInstall = ''
-          rm -rf $out/${python.sitePackages}/tests
-        '';
-      });
-
-      troposphere = (buildPythonPackage rec {
-        pname = "troposphere";
-        version = "2.7.0";
-        src = fetchPypi {
-          inherit pname version;
-          sha256 =
-            "b0ab144b989e1e1c4698e601008bd5f7fbabd0629b4588cb57d3583f8aa6edc9";
-        };
-        propagatedBuildInputs = [ cfn-flip awacs ];
-        doCheck = false; # no tests in pypi sdist
-      });
-
-      lambdaplatform = (buildPythonPackage rec {
-        pname = "lambdaplatform";
-        version = "dev";
-        src = pkgs.nix-gitignore.gitignoreSource [ ] ./.;
-        propagatedBuildInputs = [ awacs boto3 troposphere ];
-      });
-    };
+  # nixpkgs for the architecture each image is built for, building for another architecture than
+  # the host's needs a remote builder or binfmt emulation (boot.binfmt.emulatedSystems)
+  systems = {
+    x86_64 = "x86_64-linux";
+    arm64 = "aarch64-linux";
+  };
+
+  # x86_64 or arm64 per nested stack, as written by lambdaplatform-tune-memory
+  architectures = pkgs.lib.optionalAttrs (builtins.pathExists ./architectures.json)
+    (builtins.fromJSON (builtins.readFile ./architectures.json));
+
+  # the x86_64 image is always built, functions not listed in architectures.json run on it
+  imageArchitectures =
+    pkgs.lib.unique ([ "x86_64" ] ++ builtins.attrValues architectures);
+
+  build = pkgs: rec {
+    baseInterpreter = pkgs.python3;
+
+    # modification of python packages in nixpkgs
+    pyPackageOverrides = self: super: { };
+
+    # inclusion of python packages in nixpkgs
+    pyPackages = ps: with ps; [ orjson ];
+
+    # addition of python packages not included in nixpkgs
+    pyPackageExtras = ps:
+      with ps; rec {
+        awacs = (buildPythonPackage rec {
+          pname = "awacs";
+          version = "1.0.4";
+          src = fetchPypi {
+            inherit pname version;
+            sha256 =
+              "ed17fb00b5c6e571af67c7e301862d2da8a9b8e389270e4911cb7daf373ea71a";
+          };
+          postInstall = ''
+            rm -rf $out/${python.sitePackages}/tests
+          '';
+        });
+
+        troposphere = (buildPythonPackage rec {
+          pname = "troposphere";
+          version = "2.7.0";
+          src = fetchPypi {
+            inherit pname version;
+            sha256 =
+              "b0ab144b989e1e1c4698e601008bd5f7fbabd0629b4588cb57d3583f8aa6edc9";
+          };
+          propagatedBuildInputs = [ cfn-flip awacs ];
+          doCheck = false; # no tests in pypi sdist
+        });
+
+        lambdaplatform = (buildPythonPackage rec {
+          pname = "lambdaplatform";
+          version = "dev";
+          src = pkgs.nix-gitignore.gitignoreSource [ ] ./.;
+          propagatedBuildInputs = [ awacs boto3 troposphere ];
+        });
+      };
+
+    interpreter = (baseInterpreter.override {
+      packageOverrides = pyPackageOverrides;
+    }).withPackages
+      (ps: (pyPackages ps) ++ pkgs.lib.attrValues (pyPackageExtras ps));
 
-  interpreter = (baseInterpreter.override {
-    packageOverrides = pyPackageOverrides;
-  }).withPackages
-    (ps: (pyPackages ps) ++ pkgs.lib.attrValues (pyPackageExtras ps));
-
-  image = pkgs.dockerTools.streamLayeredImage {
-    name = "lambda-image";
-    contents = [ ];
-    maxLayers = 20; # bug in lambda for now
-    config = {
-      Entrypoint = [ "${interpreter}/bin/lambdaplatform-runtime" ];
-      WorkingDir = "/";
-      Env = [
-        "NIX_SSL_CERT_FILE=${pkgs.cacert}/etc/ssl/certs/ca-bundle.crt"
-        "PYTHONUNBUFFERED=1"
-      ];
+    # bytecode optimization level the image runs at, see PYTHONOPTIMIZE
+    pythonOptimize = 0;
+
+    # every module on the interpreter's path compiled ahead of time, so nothing is compiled at startup
+    bytecode = pkgs.runCommand "lambdaplatform-bytecode" { } ''
+      PYTHONPYCACHEPREFIX=$out ${interpreter}/bin/python -m lambdaplatform.runtime.bytecode \
+        --optimize ${toString pythonOptimize}
+    '';
+
+    image = pkgs.dockerTools.streamLayeredImage {
+      # one per architecture, linuxArch is x86_64 or arm64 like Lambda's names
+      name = "lambda-image-${pkgs.stdenv.hostPlatform.linuxArch}";
+      contents = [ ];
+      maxLayers = 20; # bug in lambda for now
+      config = {
+        Entrypoint = [ "${interpreter}/bin/lambdaplatform-runtime" ];
+        WorkingDir = "/";
+        Env = [
+          "NIX_SSL_CERT_FILE=${pkgs.cacert}/etc/ssl/certs/ca-bundle.crt"
+          "PYTHONUNBUFFERED=1"
+          "PYTHONDONTWRITEBYTECODE=1"
+          "PYTHONPYCACHEPREFIX=${bytecode}"
+        ] ++ pkgs.lib.optional (pythonOptimize > 0) "PYTHONOPTIMIZE=${toString pythonOptimize}";
+      };
     };
   };
 
+  native = build pkgs;
+
+  images = map (architecture:
+    (build (import pkgs.path { system = systems.${architecture}; })).image)
+    imageArchitectures;
+
+  architecturesArgs = pkgs.lib.optionalString (builtins.pathExists ./architectures.json)
+    "--architectures ${./architectures.json}";
+
+  # MemorySize per function as recommended by lambdaplatform-tune-memory --output memory_sizes.json
+  memorySizesArgs = pkgs.lib.optionalString (builtins.pathExists ./memory_sizes.json)
+    "--memory-sizes ${./memory_sizes.json}";
+
+  # provisioned concurrency, scaling windows and warmed containers per function
+  warmingArgs = pkgs.lib.optionalString (builtins.pathExists ./warming.json)
+    "--warming ${./warming.json}";
+
+  # MemorySize variants of the user function to route invocations between, by hint or payload size
+  memoryTiersArgs = pkgs.lib.optionalString (builtins.pathExists ./memory_tiers.json)
+    "--memory-tiers ${./memory_tiers.json}";
+
+  # SQS queues, Kinesis streams and DynamoDB streams invoking the user function in batches
+  eventSourcesArgs = pkgs.lib.optionalString (builtins.pathExists ./event_sources.json)
+    "--event-sources ${./event_sources.json}";
+
+  deferredExecutionArgs = pkgs.lib.optionalString deferredExecution "--deferred-execution";
+
   templates = pkgs.runCommand "cloudformation-templates" { } ''
     mkdir -p $out/templates
-    ln -s $(${interpreter}/bin/lambdaplatform-generate-templates --output-dir $out/templates) $out/primary_template
+    ln -s $(${native.interpreter}/bin/lambdaplatform-generate-templates --output-dir $out/templates ${memorySizesArgs} ${warmingArgs} ${architecturesArgs} ${memoryTiersArgs} ${eventSourcesArgs} ${deferredExecutionArgs}) $out/primary_template
   '';
 
   deploy = pkgs.writeShellScript "deploy" ''
     export PATH=${pkgs.skopeo}/bin:$PATH
     export LAMBDAPLATFORM_TEMPLATE_PATH=${templates}/templates
     export LAMBDAPLATFORM_PRIMARY_TEMPLATE_PATH=$(readlink ${templates}/primary_template)
-    export LAMBDAPLATFORM_IMAGE_GENERATOR=${image}
-    exec ${interpreter}/bin/lambdaplatform-deploy $@
+    export LAMBDAPLATFORM_IMAGE_GENERATOR=${pkgs.lib.concatStringsSep ":" images}
+    exec ${native.interpreter}/bin/lambdaplatform-deploy $@
   '';
 
   linkFarm =
-    pkgs.linkFarmFromDrvs "lambdaplatform-link-farm" [ image templates deploy ];
+    pkgs.linkFarmFromDrvs "lambdaplatform-link-farm" (images ++ [ templates deploy ]);
 
 in linkFarm
@@ -0,0 +1,240 @@
+import collections
+import functools
+import json
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+from .runtime.aio import is_async_callable
+from .runtime.metrics import increment
+
+if TYPE_CHECKING:
+    import asyncio
+
+# in the container's memory, so it lasts for warm invocations and is not shared between containers,
+# storage.memoize keeps handler results on the EFS mount instead
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+    # expired entries are still served until then while they are recomputed in the background
+    stale_until: float
+
+
+def get_size(value) -> int:
+    # approximate, containers are followed but other objects only count their own size
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+def get_key(args: tuple, kwargs: dict) -> Hashable:
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        # dicts and lists from events are keyed by their JSON
+        key = json.dumps([args, kwargs], sort_keys=True, separators=(",", ":"), default=repr)
+    return key
+
+
+class MemoryCache:
+    def __init__(
+        self, *, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "collections.OrderedDict[Hashable, Entry]" = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Entry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry.stale_until:
+                self.remove(key)
+                increment("MemoryCacheExpirations")
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, value, *, size: int, ttl: float, stale_ttl: float = 0.0):
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = Entry(value, size, now + ttl, now + ttl + stale_ttl)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                increment("MemoryCacheEvictions")
+
+    def remove(self, key: Hashable):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class Call:
+    # a computation other threads asking for the same key wait for instead of repeating it
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exception: Optional[BaseException] = None
+
+    def wait(self):
+        self.done.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+def memoize(
+    *,
+    ttl: float = 300.0,
+    stale_ttl: float = 0.0,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    sizeof: Callable[[Any], int] = get_size,
+    cache: Optional[MemoryCache] = None,
+):
+    # cached values are shared between callers, they must not be mutated
+    def decorator(function: Callable) -> Callable:
+        store = cache or MemoryCache(max_entries=max_entries, max_bytes=max_bytes)
+        is_async = is_async_callable(function)
+        calls: Dict[Hashable, Call] = {}
+        tasks: Dict[Hashable, "asyncio.Task"] = {}
+        refreshing = set()
+        lock = threading.Lock()
+
+        def save(key: Hashable, value):
+            store.set(key, value, size=sizeof(value), ttl=ttl, stale_ttl=stale_ttl)
+
+        def compute(key: Hashable, args: tuple, kwargs: dict):
+            with lock:
+                call = calls.get(key)
+                owner = call is None
+                if owner:
+                    call = calls[key] = Call()
+            if not owner:
+                return call.wait()
+            try:
+                call.value = function(*args, **kwargs)
+                save(key, call.value)
+                return call.value
+            except BaseException as ex:
+                call.exception = ex
+                raise
+            finally:
+                with lock:
+                    del calls[key]
+                call.done.set()
+
+        async def run(key: Hashable, args: tuple, kwargs: dict):
+            value = await function(*args, **kwargs)
+            save(key, value)
+            return value
+
+        def forget(key: Hashable, task: "asyncio.Task"):
+            if tasks.get(key) is task:
+                del tasks[key]
+
+        async def compute_async(key: Hashable, args: tuple, kwargs: dict):
+            import asyncio
+
+            # tasks belong to a loop, callers on another thread's loop compute on their own
+            task = tasks.get(key)
+            if task is None or task.get_loop() is not asyncio.get_running_loop():
+                task = asyncio.ensure_future(run(key, args, kwargs))
+                tasks[key] = task
+                task.add_done_callback(functools.partial(forget, key))
+            # a cancelled caller must not cancel the computation the others are waiting for
+            return await asyncio.shield(task)
+
+        def refresh(key: Hashable, args: tuple, kwargs: dict):
+            try:
+                compute(key, args, kwargs)
+            finally:
+                with lock:
+                    refreshing.discard(key)
+
+        async def refresh_async(key: Hashable, args: tuple, kwargs: dict):
+            try:
+                await compute_async(key, args, kwargs)
+            finally:
+                with lock:
+                    refreshing.discard(key)
+
+        def revalidate(key: Hashable, args: tuple, kwargs: dict):
+            from .runtime import background
+
+            with lock:
+                if key in refreshing:
+                    return
+                refreshing.add(key)
+            # recomputed once the response is out, in the meantime the stale value is served
+            background.defer(refresh_async if is_async else refresh, key, args, kwargs)
+
+        def lookup(key: Hashable, args: tuple, kwargs: dict):
+            entry = store.get(key)
+            if entry is None:
+                increment("MemoryCacheMisses")
+                return None
+            if time.monotonic() >= entry.expires_at:
+                increment("MemoryCacheStaleHits")
+                revalidate(key, args, kwargs)
+            else:
+                increment("MemoryCacheHits")
+            return entry
+
+        if is_async:
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                key = get_key(args, kwargs)
+                entry = lookup(key, args, kwargs)
+                if entry is None:
+                    return await compute_async(key, args, kwargs)
+                return entry.value
+
+            wrapper = async_wrapper
+        else:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                key = get_key(args, kwargs)
+                entry = lookup(key, args, kwargs)
+                if entry is None:
+                    return compute(key, args, kwargs)
+                return entry.value
+
+        wrapper.cache = store
+        wrapper.cache_clear = store.clear
+        return wrapper
+
+    return decorator
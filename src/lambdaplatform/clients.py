@@ -0,0 +1,81 @@
+import json
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+import botocore.config
+
+# clients live as long as the container so warm invocations reuse their connection pools
+_cache: Dict[Tuple, object] = {}
+# unlike clients, resources must not be shared between threads, each thread gets its own
+_resources = threading.local()
+_lock = threading.RLock()
+_session: Optional[boto3.Session] = None
+# bumped by clear(), so other threads drop the resources they created from the old session
+_generation = 0
+
+
+def get_session() -> boto3.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.Session()
+    return _session
+
+
+def get_config_key(config: Optional[botocore.config.Config]) -> Optional[str]:
+    if config is None:
+        return None
+    return json.dumps(config._user_provided_options, sort_keys=True, default=repr)
+
+
+def _get_or_create(kind: str, service_name: str, region_name: Optional[str], config):
+    key = (kind, service_name, region_name, get_config_key(config))
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    # creating clients from a shared session is not thread-safe
+    with _lock:
+        if key not in _cache:
+            factory = getattr(get_session(), kind)
+            _cache[key] = factory(service_name, region_name=region_name, config=config)
+        return _cache[key]
+
+
+def client(
+    service_name: str,
+    *,
+    region_name: Optional[str] = None,
+    config: Optional[botocore.config.Config] = None,
+):
+    return _get_or_create("client", service_name, region_name, config)
+
+
+def resource(
+    service_name: str,
+    *,
+    region_name: Optional[str] = None,
+    config: Optional[botocore.config.Config] = None,
+):
+    if getattr(_resources, "generation", None) != _generation:
+        _resources.cache = {}
+        _resources.generation = _generation
+    cache = _resources.cache
+    key = (service_name, region_name, get_config_key(config))
+    if key not in cache:
+        # the session is shared, creating from it is not thread-safe either
+        with _lock:
+            cache[key] = get_session().resource(
+                service_name, region_name=region_name, config=config
+            )
+    return cache[key]
+
+
+def clear():
+    global _session, _generation
+    with _lock:
+        _cache.clear()
+        _session = None
+        _generation += 1
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import math
+import os
+import time
+from typing import Callable, Mapping, Optional
+
+from . import scatter
+from .runtime.metrics import increment
+
+# SQS holds messages back for at most 15 minutes, longer delays wait in a DynamoDB table until TTL
+# deletes the item, which is only precise to minutes or more, its stream then queues the work
+MAX_QUEUE_DELAY = 900
+# queued work keeps its table item until it has run, so duplicates coalesce meanwhile, the TTL
+# only cleans up after work that never completed
+QUEUED_RETENTION = 24 * 60 * 60
+
+QUEUE_URL = "LAMBDAPLATFORM_DEFERRED_QUEUE_URL"
+QUEUE_ARN = "LAMBDAPLATFORM_DEFERRED_QUEUE_ARN"
+TABLE = "LAMBDAPLATFORM_DEFERRED_TABLE"
+
+
+def get_key(name: str, payload) -> str:
+    digest = hashlib.sha256(name.encode("utf-8") + b"\0")
+    digest.update(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_clients():
+    from . import clients
+
+    return clients.client("sqs"), clients.client("dynamodb")
+
+
+def claim(
+    key: str,
+    name: str,
+    payload: str,
+    due_at: float,
+    *,
+    queued: bool,
+    environment: Mapping[str, str],
+) -> bool:
+    _, dynamodb = get_clients()
+    expires_at = due_at + QUEUED_RETENTION if queued else due_at
+    try:
+        dynamodb.put_item(
+            TableName=environment[TABLE],
+            Item={
+                "key": {"S": key},
+                "task": {"S": name},
+                "payload": {"S": payload},
+                "due_at": {"N": repr(due_at)},
+                "expires_at": {"N": str(math.ceil(expires_at))},
+                "queued": {"BOOL": queued},
+            },
+            ConditionExpression="attribute_not_exists(#key)",
+            ExpressionAttributeNames={"#key": "key"},
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        increment("DeferredCoalesced")
+        return False
+    return True
+
+
+def enqueue(key: str, name: str, payload: str, delay: float, *, environment: Mapping[str, str]):
+    sqs, dynamodb = get_clients()
+    try:
+        sqs.send_message(
+            QueueUrl=environment[QUEUE_URL],
+            MessageBody=json.dumps({"key": key, "task": name, "payload": payload}),
+            DelaySeconds=min(MAX_QUEUE_DELAY, max(0, math.ceil(delay))),
+        )
+    except BaseException:
+        # an orphaned claim would swallow every resubmission until it expires
+        dynamodb.delete_item(TableName=environment[TABLE], Key={"key": {"S": key}})
+        raise
+
+
+def schedule(
+    function: Callable,
+    payload=None,
+    *,
+    delay: float = 0.0,
+    key: Optional[str] = None,
+    environment: Mapping[str, str] = os.environ,
+) -> bool:
+    # runs a registered task with the payload after at least `delay` seconds, work with the same
+    # key (the task and payload by default) that is still pending is coalesced, returning False
+    name = scatter.get_task_name(function)
+    if scatter.get_task(name) is not function:
+        raise ValueError(f"{name} is not a registered task, decorate it with @scatter.task")
+    key = key or get_key(name, payload)
+    encoded = json.dumps(payload, separators=(",", ":"))
+    queued = delay <= MAX_QUEUE_DELAY
+    if not claim(key, name, encoded, time.time() + delay, queued=queued, environment=environment):
+        return False
+    if queued:
+        enqueue(key, name, encoded, delay, environment=environment)
+    increment("DeferredScheduled")
+    return True
+
+
+def is_deferred_event(event, environment: Mapping[str, str] = os.environ) -> bool:
+    if not isinstance(event, dict):
+        return False
+    records = event.get("Records")
+    if not isinstance(records, list) or not records or not isinstance(records[0], dict):
+        return False
+    arn = records[0].get("eventSourceARN", "")
+    table = environment.get(TABLE)
+    return arn == environment.get(QUEUE_ARN) or bool(table and f":table/{table}/stream/" in arn)
+
+
+def run(record, *, environment: Mapping[str, str] = os.environ):
+    message = json.loads(record["body"])
+    result = scatter.get_task(message["task"])(json.loads(message["payload"]))
+    if hasattr(result, "__await__"):
+        import asyncio
+
+        # records run on batch worker threads, each coroutine gets a loop of its own
+        asyncio.run(result)
+    _, dynamodb = get_clients()
+    dynamodb.delete_item(TableName=environment[TABLE], Key={"key": {"S": message["key"]}})
+    increment("DeferredRuns")
+
+
+def is_expired(record) -> bool:
+    identity = record.get("userIdentity") or {}
+    return (
+        record.get("eventName") == "REMOVE"
+        and identity.get("type") == "Service"
+        and identity.get("principalId") == "dynamodb.amazonaws.com"
+    )
+
+
+def release(record, *, environment: Mapping[str, str] = os.environ):
+    # the mapping filters for TTL deletions already, the checks only guard against a wider filter
+    if not is_expired(record):
+        return
+    item = record["dynamodb"]["OldImage"]
+    if item["queued"]["BOOL"]:
+        return
+    key, name, payload = item["key"]["S"], item["task"]["S"], item["payload"]["S"]
+    due_at = float(item["due_at"]["N"])
+    # claimed again as queued work, so duplicates keep coalescing until it has run
+    if claim(key, name, payload, due_at, queued=True, environment=environment):
+        enqueue(key, name, payload, due_at - time.time(), environment=environment)
+
+
+def handle(event, *, environment: Mapping[str, str] = os.environ) -> dict:
+    from .runtime import batch
+
+    if event["Records"][0].get("eventSource") == "aws:dynamodb":
+        return batch.process_batch(event, lambda record: release(record, environment=environment))
+    return batch.process_batch(event, lambda record: run(record, environment=environment))
@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+from . import deferred, scatter
+from .runtime.metrics import take_counters
+
+# exercises lambdaplatform.deferred end to end against whatever AWS_ENDPOINT_URL points at, a
+# moto server or LocalStack, playing the part of the event source mappings itself
+
+_runs: List = []
+
+
+@scatter.task
+def record_run(payload):
+    _runs.append(payload)
+
+
+def create_resources(name: str) -> Dict[str, str]:
+    sqs, dynamodb = deferred.get_clients()
+    queue_url = sqs.create_queue(QueueName=name)["QueueUrl"]
+    queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])[
+        "Attributes"
+    ]["QueueArn"]
+    dynamodb.create_table(
+        TableName=name,
+        AttributeDefinitions=[{"AttributeName": "key", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "key", "KeyType": "HASH"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    dynamodb.get_waiter("table_exists").wait(TableName=name)
+    return {deferred.QUEUE_URL: queue_url, deferred.QUEUE_ARN: queue_arn, deferred.TABLE: name}
+
+
+def delete_resources(environment: Dict[str, str]):
+    sqs, dynamodb = deferred.get_clients()
+    sqs.delete_queue(QueueUrl=environment[deferred.QUEUE_URL])
+    dynamodb.delete_table(TableName=environment[deferred.TABLE])
+
+
+def receive(environment: Dict[str, str]) -> dict:
+    # what the SQS mapping would invoke the function with, delayed messages are not waited for
+    sqs, _ = deferred.get_clients()
+    messages = sqs.receive_message(
+        QueueUrl=environment[deferred.QUEUE_URL], MaxNumberOfMessages=10, WaitTimeSeconds=1
+    ).get("Messages", [])
+    for message in messages:
+        sqs.delete_message(
+            QueueUrl=environment[deferred.QUEUE_URL], ReceiptHandle=message["ReceiptHandle"]
+        )
+    return {
+        "Records": [
+            {
+                "messageId": message["MessageId"],
+                "body": message["Body"],
+                "eventSource": "aws:sqs",
+                "eventSourceARN": environment[deferred.QUEUE_ARN],
+            }
+            for message in messages
+        ]
+    }
+
+
+def run_queued(environment: Dict[str, str]):
+    event = receive(environment)
+    if event["Records"]:
+        deferred.handle(event, environment=environment)
+
+
+def expire(environment: Dict[str, str], key: str) -> dict:
+    # what the table's stream mapping would invoke the function with once TTL deleted the item
+    _, dynamodb = deferred.get_clients()
+    table = environment[deferred.TABLE]
+    item = dynamodb.delete_item(TableName=table, Key={"key": {"S": key}}, ReturnValues="ALL_OLD")
+    # as though the delay had passed, TTL deletes items only once they are due
+    item["Attributes"]["due_at"] = {"N": repr(time.time())}
+    return {
+        "Records": [
+            {
+                "eventName": "REMOVE",
+                "eventSource": "aws:dynamodb",
+                "eventSourceARN": f"arn:aws:dynamodb:local:000000000000:table/{table}/stream/check",
+                "userIdentity": {"type": "Service", "principalId": "dynamodb.amazonaws.com"},
+                "dynamodb": {
+                    "Keys": {"key": {"S": key}},
+                    "OldImage": item["Attributes"],
+                    "SequenceNumber": "1",
+                },
+            }
+        ]
+    }
+
+
+def run_checks(environment: Dict[str, str]) -> Dict[str, bool]:
+    results = {}
+    results["schedule"] = deferred.schedule(record_run, {"n": 1}, environment=environment)
+    results["coalesce"] = not deferred.schedule(record_run, {"n": 1}, environment=environment)
+    event = receive(environment)
+    results["is_deferred_event"] = deferred.is_deferred_event(event, environment)
+    response = deferred.handle(event, environment=environment)
+    results["run"] = _runs == [{"n": 1}] and not response["batchItemFailures"]
+    # the claim is gone once the work has run, the same work can be scheduled again
+    results["reschedule"] = deferred.schedule(record_run, {"n": 1}, environment=environment)
+    run_queued(environment)
+
+    # longer delays than SQS allows wait in the table until TTL, released through its stream
+    key = "long-delay"
+    results["schedule_long"] = deferred.schedule(
+        record_run, {"n": 2}, delay=3600, key=key, environment=environment
+    )
+    results["not_queued_yet"] = not receive(environment)["Records"]
+    event = expire(environment, key)
+    results["is_stream_event"] = deferred.is_deferred_event(event, environment)
+    deferred.handle(event, environment=environment)
+    run_queued(environment)
+    results["release"] = _runs[-1] == {"n": 2}
+    return results
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--prefix", default="lambdaplatform-deferred-check")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = get_args()
+    environment = create_resources(f"{args.prefix}-{uuid.uuid4().hex[:8]}")
+    try:
+        results = run_checks(environment)
+    finally:
+        delete_resources(environment)
+    print(json.dumps({"checks": results, "counters": take_counters()}))
+    if not all(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,12 @@ from typing import Dict, Optional, Tuple
 
 import boto3
 
+# image architecture as reported by skopeo inspect, to the stack parameter and tag it is deployed as
+IMAGE_TARGETS = {
+    "amd64": ("ImageDigest", "latest"),
+    "arm64": ("ImageDigestArm64", "latest-arm64"),
+}
+
 
 def env_default(name, *, prefix=__package__.upper(), environment=os.environ):
     env_key = f"{prefix}_{name}"
@@ -36,8 +42,9 @@ def get_args():
     )
     parser.add_argument(
         "--image-generator",
-        help="Executable that outputs a container image tarball on stdout",
-        type=pathlib.Path,
+        help="Executables that output a container image tarball on stdout, separated by "
+        f"{os.pathsep!r}, one per architecture",
+        type=lambda value: [pathlib.Path(path) for path in value.split(os.pathsep)],
         **env_default("IMAGE_GENERATOR"),
     )
     return parser.parse_args()
@@ -81,6 +88,57 @@ def run_subprocess(args):
     return subprocess.run(args, stdout=subprocess.PIPE, encoding="utf-8", check=True)
 
 
+def push_image(ecr, image_generator: pathlib.Path, temp_path: pathlib.Path, repository_url: str):
+    temp_path.mkdir()
+
+    print(f"Generating container image with {image_generator}")
+    image_path = (temp_path / "image.tar").resolve()
+    with image_path.open("wb") as f:
+        subprocess.run([image_generator], stdout=f, stderr=subprocess.PIPE, check=True)
+
+    print("Packing container image")
+    canonical_image_path = (temp_path / "canonical-image").resolve()
+    run_subprocess(
+        [
+            "skopeo",
+            "copy",
+            f"docker-archive:{image_path}",
+            f"dir:{canonical_image_path}",
+            "--insecure-policy",
+            "--dest-compress",
+        ]
+    )
+
+    process = run_subprocess(
+        [
+            "skopeo",
+            "inspect",
+            f"dir:{canonical_image_path}",
+        ]
+    )
+    inspection = json.loads(process.stdout)
+    architecture, image_digest = inspection["Architecture"], inspection["Digest"]
+    if architecture not in IMAGE_TARGETS:
+        raise Exception(f"Unsupported image architecture {architecture!r}")
+    _, tag = IMAGE_TARGETS[architecture]
+
+    print(f"Uploading {architecture} container image to docker://{repository_url}")
+    print("*", image_digest)
+    username, password = get_ecr_credentials(ecr)
+    run_subprocess(
+        [
+            "skopeo",
+            "copy",
+            f"dir:{canonical_image_path}",
+            f"docker://{repository_url}:{tag}",
+            "--insecure-policy",
+            "--dest-creds",
+            f"{username}:{password}",
+        ]
+    )
+    return architecture, image_digest
+
+
 def main():
     args = get_args()
     session = create_session(args.region, args.profile)
@@ -110,50 +168,21 @@ def main():
                 bucket.Object(key).upload_fileobj(f)
 
     ecr = session.client("ecr")
+    image_digests = {parameter: "" for parameter, _ in IMAGE_TARGETS.values()}
     with tempfile.TemporaryDirectory(prefix=f"{__package__}.") as temp_dir:
-        temp_path = pathlib.Path(temp_dir)
-
-        print("Generating container image")
-        image_path = (temp_path / "image.tar").resolve()
-        with image_path.open("wb") as f:
-            subprocess.run([args.image_generator], stdout=f, stderr=subprocess.PIPE, check=True)
-
-        print("Packing container image")
-        canonical_image_path = (temp_path / "canonical-image").resolve()
-        run_subprocess(
-            [
-                "skopeo",
-                "copy",
-                f"docker-archive:{image_path}",
-                f"dir:{canonical_image_path}",
-                "--insecure-policy",
-                "--dest-compress",
-            ]
-        )
-
-        process = run_subprocess(
-            [
-                "skopeo",
-                "inspect",
-                f"dir:{canonical_image_path}",
-            ]
-        )
-        image_digest = json.loads(process.stdout)["Digest"]
-
-        print(f"Uploading container image to docker://{outputs['ArtifactRepositoryUrl']}")
-        print("*", image_digest)
-        username, password = get_ecr_credentials(ecr)
-        run_subprocess(
-            [
-                "skopeo",
-                "copy",
-                f"dir:{canonical_image_path}",
-                f"docker://{outputs['ArtifactRepositoryUrl']}:latest",
-                "--insecure-policy",
-                "--dest-creds",
-                f"{username}:{password}",
-            ]
-        )
+        for idx, image_generator in enumerate(args.image_generator):
+            architecture, image_digest = push_image(
+                ecr,
+                image_generator,
+                pathlib.Path(temp_dir) / str(idx),
+                outputs["ArtifactRepositoryUrl"],
+            )
+            parameter, _ = IMAGE_TARGETS[architecture]
+            if image_digests[parameter]:
+                raise Exception(f"More than one {architecture} image generated")
+            image_digests[parameter] = image_digest
+    if not image_digests["ImageDigest"]:
+        raise Exception("An amd64 image is required, the stack deploys once ImageDigest is set")
 
     print("Updating CloudFormation stack")
     s3_artifact_path = args.primary_template_path.relative_to(args.template_path)
@@ -162,9 +191,10 @@ def main():
         TemplateURL=f"https://{outputs['ArtifactBucket']}.s3.amazonaws.com/{s3_artifact_path}",
         Parameters=[
             {
-                "ParameterKey": "ImageDigest",
+                "ParameterKey": parameter,
                 "ParameterValue": image_digest,
             }
+            for parameter, image_digest in image_digests.items()
         ],
         Capabilities=["CAPABILITY_IAM"],
     )
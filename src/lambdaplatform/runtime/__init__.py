@@ -0,0 +1,265 @@
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from typing import Dict, Optional
+
+from .. import warmer
+from . import aio, background, codec, context, dispatch, streaming
+from .api import RuntimeApiConnection, format_error
+from .background import BackgroundExtension
+from .memory import MemoryTracker
+from .metrics import MetricsEmitter, take_counters
+from .profiling import ImportProfiler
+
+PHASES = ("PollTime", "DecodeTime", "HandlerTime", "EncodeTime", "PostTime")
+# in Lambda's terms, recorded along with memory metrics so the tuner can compare architectures
+ARCHITECTURE = {"aarch64": "arm64"}.get(os.uname().machine, os.uname().machine)
+
+
+@contextlib.contextmanager
+def report_error(connection: RuntimeApiConnection, request_id: Optional[str] = None):
+    try:
+        yield
+    except BaseException as ex:
+        connection.request(
+            "POST",
+            f"/invocation/{request_id}/error" if request_id else "/init/error",
+            data=format_error(ex),
+        )
+        if request_id is None:
+            sys.exit(1)
+
+
+def env_default(name, default=None, *, environment=os.environ):
+    return {"default": environment.get(f"LAMBDAPLATFORM_{name}", default)}
+
+
+def env_flag(name, *, environment=os.environ):
+    value = environment.get(f"LAMBDAPLATFORM_{name}", "")
+    return {"action": "store_true", "default": value.lower() in {"1", "true", "yes"}}
+
+
+def get_args(argv=None, *, environment=os.environ):
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("handler")
+    parser.add_argument(
+        "--codec",
+        choices=["auto", *codec.CODECS],
+        help="JSON implementation used for events and responses",
+        **env_default("CODEC", "auto", environment=environment),
+    )
+    parser.add_argument(
+        "--raw",
+        help="Pass the event to the handler as a memoryview and post its bytes/str result as-is",
+        **env_flag("RAW", environment=environment),
+    )
+    parser.add_argument(
+        "--profile-imports",
+        help="Log a per-module import time breakdown of the init phase",
+        **env_flag("PROFILE_IMPORTS", environment=environment),
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Emit per-invocation phase timings as CloudWatch Embedded Metric Format",
+        **env_flag("METRICS", environment=environment),
+    )
+    parser.add_argument(
+        "--metrics-namespace",
+        **env_default("METRICS_NAMESPACE", "lambdaplatform", environment=environment),
+    )
+    parser.add_argument(
+        "--metrics-flush-every",
+        type=int,
+        help="Aggregate timings of this many invocations into one metrics document",
+        **env_default("METRICS_FLUSH_EVERY", 1, environment=environment),
+    )
+    parser.add_argument(
+        "--memory",
+        help="Emit per-invocation peak and current RSS in MiB along with the phase timings",
+        **env_flag("MEMORY", environment=environment),
+    )
+    parser.add_argument(
+        "--memory-tracemalloc-every",
+        type=int,
+        help="Also trace the Python heap peak of every nth invocation, 0 disables tracing",
+        **env_default("MEMORY_TRACEMALLOC_EVERY", 0, environment=environment),
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=["text", "json"],
+        type=str.lower,
+        help="Format of log records, json enables request id tagged structured logging",
+        **env_default(
+            "LOG_FORMAT",
+            environment.get("AWS_LAMBDA_LOG_FORMAT", "text"),
+            environment=environment,
+        ),
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        help="Root log level, can be overridden per invocation via client context logLevel",
+        **env_default(
+            "LOG_LEVEL",
+            environment.get("AWS_LAMBDA_LOG_LEVEL", "INFO"),
+            environment=environment,
+        ),
+    )
+    parser.add_argument(
+        "--log-buffer-bytes",
+        type=int,
+        help="Buffer stdout and log records up to this size, flushing once per invocation",
+        **env_default("LOG_BUFFER_BYTES", 0, environment=environment),
+    )
+    parser.add_argument(
+        "--background-extension",
+        help="Run deferred background work from an internal extension and flush on SIGTERM",
+        **env_flag("BACKGROUND_EXTENSION", environment=environment),
+    )
+    return parser.parse_args(argv)
+
+
+def main(*, environment: Dict[str, str] = os.environ, argv=None):
+    init_started_at = time.perf_counter()
+    args = get_args(argv, environment=environment)
+    connection = RuntimeApiConnection(environment["AWS_LAMBDA_RUNTIME_API"])
+    logs = None
+    if args.log_format == "json" or args.log_buffer_bytes:
+        # logging adds ~10 ms of imports to init, only pay for it when asked to
+        from . import log
+
+        logs = log.configure(
+            level=args.log_level,
+            json_format=args.log_format == "json",
+            buffer_bytes=args.log_buffer_bytes,
+        )
+    profiler = ImportProfiler() if args.profile_imports else contextlib.nullcontext()
+    with report_error(connection), profiler:
+        callable = dispatch.load_handler(args.handler)
+        if args.raw:
+            decode, encode = memoryview, codec.encode_raw
+        else:
+            json_codec = codec.get_codec(args.codec)
+            decode, encode = json_codec.loads, json_codec.dumps
+        pass_context = context.accepts_context(callable)
+        if aio.is_async_callable(callable):
+            aio.get_event_loop()
+        metrics = None
+        if args.metrics or args.memory:
+            metrics = MetricsEmitter(
+                args.metrics_namespace,
+                {"FunctionName": environment.get("AWS_LAMBDA_FUNCTION_NAME", "local")},
+                flush_every=args.metrics_flush_every,
+            )
+        memory = None
+        if args.memory:
+            memory = MemoryTracker(tracemalloc_every=args.memory_tracemalloc_every)
+        # platform features are only imported by functions configured for them, keeping them off
+        # every other function's cold start
+        router = None
+        if "LAMBDAPLATFORM_MEMORY_TIERS" in environment:
+            from .. import tiers
+
+            router = tiers.get_router(environment)
+        deferred = None
+        if "LAMBDAPLATFORM_DEFERRED_QUEUE_ARN" in environment:
+            from .. import deferred
+        if warmer.get_containers(environment) > 1:
+            warmer.register()
+        # without scatter imported by now, no task could be registered to run
+        scatter = sys.modules.get("lambdaplatform.scatter")
+        extension = None
+        if args.background_extension:
+            extension = BackgroundExtension(
+                environment["AWS_LAMBDA_RUNTIME_API"],
+                on_drained=logs.flush if logs is not None else None,
+            ).register()
+            # registered extensions make Lambda send SIGTERM at shutdown, exiting runs atexit hooks
+            atexit.register(background.drain)
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    init_duration = time.perf_counter() - init_started_at
+    if args.profile_imports:
+        report = profiler.report()
+        report["initMs"] = round(init_duration * 1000, 3)
+        print(json.dumps(report))
+    cold = True
+    while True:
+        polled_at = time.perf_counter()
+        invocation = connection.request("GET", "/invocation/next")
+        request_id = invocation.headers["Lambda-Runtime-Aws-Request-Id"]
+        timestamps = [polled_at, time.perf_counter()]
+        invocation_context = context.Context.from_headers(
+            invocation.headers, environment=environment
+        )
+        context.set_current(invocation_context)
+        invocation_logs = contextlib.nullcontext()
+        if logs is not None:
+            invocation_logs = logs.invocation(
+                request_id, client_context=invocation.headers.get("Lambda-Runtime-Client-Context")
+            )
+        if memory is not None:
+            memory.start()
+        with report_error(connection, request_id), invocation_logs:
+            tier = None
+            if router is not None:
+                tier = router.route(invocation.body, invocation_context.client_context)
+            # relayed undecoded, the tier's response is posted as it came back
+            event = decode(invocation.body) if tier is None else None
+            timestamps.append(time.perf_counter())
+            if tier is not None:
+                result = router.invoke_tier(
+                    tier, invocation.body, client_context=invocation_context.client_context
+                )
+            elif warmer.is_warm_event(event):
+                result = warmer.handle(event, environment=environment)
+            elif scatter is not None and scatter.is_scatter_event(event):
+                result = scatter.handle(event)
+            elif deferred is not None and deferred.is_deferred_event(event, environment):
+                result = deferred.handle(event, environment=environment)
+            elif pass_context:
+                result = callable(event, invocation_context)
+            else:
+                result = callable(event)
+            if aio.is_awaitable(result):
+                result = aio.run(result)
+            if aio.is_async_iterator(result):
+                result = aio.iterate(result)
+            timestamps.append(time.perf_counter())
+            if logs is not None:
+                logs.flush()
+            if streaming.is_stream(result):
+                # encoding is interleaved with sending, the whole stream counts as posting
+                timestamps.append(timestamps[-1])
+                streaming.post_stream(connection, request_id, result, encode)
+            else:
+                data = result if tier is not None else encode(result)
+                timestamps.append(time.perf_counter())
+                connection.request("POST", f"/invocation/{request_id}/response", data=data)
+            timestamps.append(time.perf_counter())
+        if extension is not None:
+            extension.invocation_responded()
+        else:
+            background.drain()
+        if metrics is not None:
+            values = {
+                name: (end - start) * 1000
+                for name, start, end in zip(PHASES, timestamps, timestamps[1:])
+            }
+            values["ColdStart"] = int(cold)
+            if cold:
+                values["InitDuration"] = init_duration * 1000
+            properties = {"RequestId": request_id}
+            if memory is not None:
+                values.update(memory.stop())
+                properties["MemorySize"] = environment.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+                properties["Architecture"] = ARCHITECTURE
+            values.update(take_counters())
+            metrics.record(values, properties=properties)
+        if logs is not None:
+            logs.flush()
+        cold = False
@@ -0,0 +1,57 @@
+import warnings
+from typing import Any, AsyncIterator, Awaitable, Iterator
+
+# asyncio is only imported once an async handler shows up, synchronous handlers never pay for it
+CO_COROUTINE = 0x80
+CO_ASYNC_GENERATOR = 0x200
+
+_event_loop = None
+
+
+def is_async_callable(callable) -> bool:
+    function = getattr(callable, "__func__", callable)
+    code = getattr(function, "__code__", None)
+    if code is None:
+        code = getattr(getattr(callable, "__call__", None), "__code__", None)
+    return code is not None and bool(code.co_flags & (CO_COROUTINE | CO_ASYNC_GENERATOR))
+
+
+def is_awaitable(result) -> bool:
+    return hasattr(result, "__await__")
+
+
+def is_async_iterator(result) -> bool:
+    return hasattr(result, "__anext__")
+
+
+def get_event_loop():
+    global _event_loop
+    if _event_loop is None or _event_loop.is_closed():
+        import asyncio
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            try:
+                # adopt a loop the handler module may already have bound resources to
+                _event_loop = asyncio.get_event_loop()
+            except RuntimeError:
+                _event_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_event_loop)
+    return _event_loop
+
+
+def run(awaitable: Awaitable) -> Any:
+    return get_event_loop().run_until_complete(awaitable)
+
+
+def iterate(async_iterator: AsyncIterator) -> Iterator:
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        if hasattr(async_iterator, "aclose"):
+            loop.run_until_complete(async_iterator.aclose())
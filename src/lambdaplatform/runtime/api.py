@@ -0,0 +1,99 @@
+import http.client
+import json
+import socket
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+
+class RuntimeApiError(Exception):
+    pass
+
+
+class RuntimeApiResponse(NamedTuple):
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+
+
+def format_error(ex: BaseException) -> bytes:
+    return json.dumps({"type": type(ex).__qualname__, "message": str(ex)}).encode("utf-8")
+
+
+class RuntimeApiConnection:
+    def __init__(self, address: str, *, base_path: str = "/2018-06-01/runtime"):
+        host, _, port = address.partition(":")
+        self.host = host
+        self.port = int(port) if port else None
+        self.base_path = base_path
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection = http.client.HTTPConnection(self.host, self.port)
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _read_response(self, method, path) -> RuntimeApiResponse:
+        response = self._connection.getresponse()
+        body = response.read()
+        if response.will_close:
+            self.close()
+        if response.status >= 400:
+            raise RuntimeApiError(f"{method} {path} returned HTTP {response.status}: {body!r}")
+        return RuntimeApiResponse(response.status, response.headers, body)
+
+    def request(self, method, path, *, data=None, headers=None) -> RuntimeApiResponse:
+        # a dropped keep-alive connection is only noticed when it is next used, so a request gets
+        # one retry on a fresh connection, unless it may have reached the Runtime API already: a
+        # response or error posted twice is rejected, only GETs are safe to replay once sent
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            sent = False
+            try:
+                self._connection.request(
+                    method, f"{self.base_path}{path}", body=data, headers=headers or {}
+                )
+                sent = True
+                return self._read_response(method, path)
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt or (sent and method != "GET"):
+                    raise
+
+    def request_chunked(
+        self,
+        method,
+        path,
+        chunks: Iterable[bytes],
+        *,
+        headers=None,
+        trailers: Optional[Callable[[], Dict[str, str]]] = None,
+    ) -> RuntimeApiResponse:
+        # a partially sent stream cannot be replayed, so unlike request() there is no retry
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            self._connection.putrequest(method, f"{self.base_path}{path}")
+            for key, value in {**(headers or {}), "Transfer-Encoding": "chunked"}.items():
+                self._connection.putheader(key, value)
+            self._connection.endheaders()
+            for chunk in chunks:
+                if len(chunk):
+                    self._connection.send(b"%X\r\n%b\r\n" % (len(chunk), chunk))
+            self._connection.send(
+                b"0\r\n"
+                + b"".join(
+                    f"{key}: {value}\r\n".encode("latin-1")
+                    for key, value in (trailers() if trailers else {}).items()
+                )
+                + b"\r\n"
+            )
+            return self._read_response(method, path)
+        except BaseException:
+            self.close()
+            raise
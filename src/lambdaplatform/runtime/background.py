@@ -0,0 +1,80 @@
+import collections
+import functools
+import json
+import sys
+import threading
+import traceback
+from typing import Callable, Optional
+
+from . import aio
+from .api import RuntimeApiConnection
+
+_tasks: "collections.deque[Callable]" = collections.deque()
+_retries: "collections.deque[Callable]" = collections.deque()
+
+
+def defer(function: Callable, *args, **kwargs):
+    _tasks.append(functools.partial(function, *args, **kwargs))
+
+
+def defer_retry(function: Callable, *args, **kwargs):
+    # run by the next drain rather than the current one, so failing work is not retried in a loop
+    _retries.append(functools.partial(function, *args, **kwargs))
+
+
+def drain():
+    while True:
+        try:
+            task = _tasks.popleft()
+        except IndexError:
+            break
+        try:
+            result = task()
+            if aio.is_awaitable(result):
+                aio.run(result)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+    while _retries:
+        _tasks.append(_retries.popleft())
+
+
+class BackgroundExtension:
+    # Lambda only freezes the environment once every extension has asked for its next event, so
+    # the extension holds that request back until the work deferred by the invocation is done
+    def __init__(
+        self,
+        address: str,
+        *,
+        name: str = "lambdaplatform-background",
+        on_drained: Optional[Callable[[], None]] = None,
+    ):
+        self.connection = RuntimeApiConnection(address, base_path="/2020-01-01/extension")
+        self.name = name
+        self.on_drained = on_drained
+        self.identifier: Optional[str] = None
+        self.responded = threading.Event()
+
+    def register(self) -> "BackgroundExtension":
+        response = self.connection.request(
+            "POST",
+            "/register",
+            data=json.dumps({"events": ["INVOKE"]}).encode("utf-8"),
+            headers={"Lambda-Extension-Name": self.name},
+        )
+        self.identifier = response.headers["Lambda-Extension-Identifier"]
+        threading.Thread(target=self.run, name=self.name, daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            self.connection.request(
+                "GET", "/event/next", headers={"Lambda-Extension-Identifier": self.identifier}
+            )
+            self.responded.wait()
+            self.responded.clear()
+            drain()
+            if self.on_drained is not None:
+                self.on_drained()
+
+    def invocation_responded(self):
+        self.responded.set()
@@ -0,0 +1,144 @@
+import concurrent.futures
+import json
+import sys
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from . import aio
+
+DEFAULT_MAX_WORKERS = 8
+
+_executors: Dict[int, concurrent.futures.ThreadPoolExecutor] = {}
+
+
+def get_item_identifier(record) -> str:
+    if "messageId" in record:
+        return record["messageId"]
+    if "kinesis" in record:
+        return record["kinesis"]["sequenceNumber"]
+    if "dynamodb" in record:
+        return record["dynamodb"]["SequenceNumber"]
+    raise ValueError(f"Unsupported record from {record.get('eventSource')!r}")
+
+
+def get_ordering_key(record) -> Optional[str]:
+    # records sharing a key are processed in order, unkeyed (standard SQS) records all in parallel
+    if "messageId" in record:
+        return record.get("attributes", {}).get("MessageGroupId")
+    if "kinesis" in record:
+        return record["kinesis"]["partitionKey"]
+    if "dynamodb" in record:
+        return json.dumps(record["dynamodb"]["Keys"], sort_keys=True)
+    return None
+
+
+def group_records(records) -> List[List[dict]]:
+    groups: Dict[str, List[dict]] = {}
+    unordered = []
+    for record in records:
+        key = get_ordering_key(record)
+        if key is None:
+            unordered.append([record])
+        else:
+            groups.setdefault(key, []).append(record)
+    return [*groups.values(), *unordered]
+
+
+def get_executor(max_workers: int) -> concurrent.futures.ThreadPoolExecutor:
+    if max_workers not in _executors:
+        _executors[max_workers] = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="lambdaplatform-batch"
+        )
+    return _executors[max_workers]
+
+
+def process_group(records: List[dict], record_handler: Callable) -> List[str]:
+    for idx, record in enumerate(records):
+        try:
+            record_handler(record)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            # later records of the group must not overtake the failed one
+            return [get_item_identifier(remaining) for remaining in records[idx:]]
+    return []
+
+
+async def process_groups_async(groups, record_handler: Callable, max_workers: int) -> List[str]:
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def process_group_async(records):
+        async with semaphore:
+            for idx, record in enumerate(records):
+                try:
+                    await record_handler(record)
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+                    return [get_item_identifier(remaining) for remaining in records[idx:]]
+            return []
+
+    results = await asyncio.gather(*(process_group_async(records) for records in groups))
+    return [identifier for failures in results for identifier in failures]
+
+
+def get_batch_response(records, failed: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    failed = set(failed)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": get_item_identifier(record)}
+            for record in records
+            if get_item_identifier(record) in failed
+        ]
+    }
+
+
+def is_loop_running() -> bool:
+    import asyncio
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def process_batch(
+    event, record_handler: Callable, *, max_workers: int = DEFAULT_MAX_WORKERS
+) -> Dict[str, List[Dict[str, str]]]:
+    records = event["Records"]
+    groups = group_records(records)
+    if aio.is_async_callable(record_handler):
+        if is_loop_running():
+            raise RuntimeError(
+                "Called from a running event loop, await process_batch_async instead"
+            )
+        failed = aio.run(process_groups_async(groups, record_handler, max_workers))
+    else:
+        executor = get_executor(max_workers)
+        futures = [executor.submit(process_group, records, record_handler) for records in groups]
+        failed = [identifier for future in futures for identifier in future.result()]
+    return get_batch_response(records, failed)
+
+
+async def process_batch_async(
+    event, record_handler: Callable, *, max_workers: int = DEFAULT_MAX_WORKERS
+) -> Dict[str, List[Dict[str, str]]]:
+    # for async handlers, synchronous record handlers run on the thread pool without blocking
+    import asyncio
+
+    records = event["Records"]
+    groups = group_records(records)
+    if aio.is_async_callable(record_handler):
+        failed = await process_groups_async(groups, record_handler, max_workers)
+    else:
+        loop = asyncio.get_running_loop()
+        executor = get_executor(max_workers)
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, process_group, records, record_handler)
+                for records in groups
+            )
+        )
+        failed = [identifier for failures in results for identifier in failures]
+    return get_batch_response(records, failed)
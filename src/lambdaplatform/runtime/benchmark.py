@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .emulator import RuntimeApiEmulator
+from .memory import read_process_memory
+
+
+def echo(event):
+    return event
+
+
+def make_payload(size: int) -> bytes:
+    envelope = json.dumps({"data": ""}).encode("utf-8")
+    return json.dumps({"data": "x" * max(0, size - len(envelope))}).encode("utf-8")
+
+
+def percentile(values: Sequence[float], pct: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def wait_for(emulator, invocation, process):
+    while not invocation.done.wait(0.1):
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"Runtime exited with status {process.returncode}: {emulator.init_error!r}"
+            )
+
+
+def run_benchmark(
+    handler: str,
+    payload_size: int,
+    *,
+    invocations: int,
+    warmup: int,
+    runtime_args: Sequence[str] = (),
+    environment: Optional[Dict[str, str]] = None,
+) -> Dict[str, float]:
+    payload = make_payload(payload_size)
+    with RuntimeApiEmulator() as emulator:
+        process = subprocess.Popen(
+            [sys.executable, "-m", __package__, handler, *runtime_args],
+            env={**os.environ, **(environment or {}), "AWS_LAMBDA_RUNTIME_API": emulator.address},
+        )
+        try:
+            for _ in range(warmup):
+                wait_for(emulator, emulator.submit(payload), process)
+            warm_memory = read_process_memory(process.pid)
+            # queue everything up front so the runtime loop never waits on the benchmark itself
+            measured = [emulator.submit(payload) for _ in range(invocations)]
+            for invocation in measured:
+                wait_for(emulator, invocation, process)
+            final_memory = read_process_memory(process.pid)
+        finally:
+            process.kill()
+            process.wait()
+
+    errors = sum(1 for invocation in measured if invocation.error is not None)
+    durations = [invocation.duration * 1000 for invocation in measured]
+    elapsed = measured[-1].completed_at - measured[0].dispatched_at
+    result = {
+        "payload_bytes": len(payload),
+        "invocations": invocations,
+        "errors": errors,
+        "p50_ms": percentile(durations, 50),
+        "p99_ms": percentile(durations, 99),
+        "throughput_per_s": invocations / elapsed if elapsed else float("inf"),
+    }
+    if warm_memory and final_memory:
+        result["peak_rss_bytes"] = final_memory["VmHWM"]
+        result["rss_growth_per_invocation_bytes"] = (
+            final_memory["VmRSS"] - warm_memory["VmRSS"]
+        ) / invocations
+    return result
+
+
+def run_cold_start_benchmark(
+    handler: str,
+    *,
+    runs: int,
+    runtime_args: Sequence[str] = (),
+    environment: Optional[Dict[str, str]] = None,
+) -> Dict[str, float]:
+    payload = make_payload(128)
+    init_durations, first_response_durations = [], []
+    for _ in range(runs):
+        with RuntimeApiEmulator() as emulator:
+            started_at = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-m", __package__, handler, *runtime_args],
+                env={
+                    **os.environ,
+                    **(environment or {}),
+                    "AWS_LAMBDA_RUNTIME_API": emulator.address,
+                },
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                invocation = emulator.submit(payload)
+                wait_for(emulator, invocation, process)
+            finally:
+                process.kill()
+                process.wait()
+        init_durations.append((emulator.first_poll_at - started_at) * 1000)
+        first_response_durations.append((invocation.completed_at - started_at) * 1000)
+    return {
+        "runs": runs,
+        "init_p50_ms": percentile(init_durations, 50),
+        "init_p99_ms": percentile(init_durations, 99),
+        "first_response_p50_ms": percentile(first_response_durations, 50),
+        "first_response_p99_ms": percentile(first_response_durations, 99),
+    }
+
+
+def format_table(results: List[Dict[str, float]]) -> str:
+    columns = [
+        ("payload_bytes", "payload", "{:>10d}"),
+        ("p50_ms", "p50 ms", "{:>9.3f}"),
+        ("p99_ms", "p99 ms", "{:>9.3f}"),
+        ("throughput_per_s", "inv/s", "{:>9.0f}"),
+        ("peak_rss_bytes", "peak rss", "{:>10d}"),
+        ("rss_growth_per_invocation_bytes", "rss/inv", "{:>9.1f}"),
+        ("errors", "errors", "{:>7d}"),
+    ]
+    lines = [" ".join(f"{title:>{len(fmt.format(0))}}" for _, title, fmt in columns)]
+    for result in results:
+        lines.append(
+            " ".join(
+                fmt.format(result[key]) if key in result else f"{'-':>{len(fmt.format(0))}}"
+                for key, _, fmt in columns
+            )
+        )
+    return "\n".join(lines)
+
+
+def format_cold_start(result: Dict[str, float]) -> str:
+    return "\n".join(
+        [
+            f"runs            {result['runs']:>9d}",
+            f"init ms         p50 {result['init_p50_ms']:9.3f}  p99 {result['init_p99_ms']:9.3f}",
+            f"first response  p50 {result['first_response_p50_ms']:9.3f}"
+            f"  p99 {result['first_response_p99_ms']:9.3f}",
+        ]
+    )
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--handler", default=f"{__package__}.benchmark:{echo.__name__}")
+    parser.add_argument(
+        "--payload-sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[128, 16 * 1024, 1024 * 1024],
+        help="Comma separated event sizes in bytes",
+    )
+    parser.add_argument("--invocations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--cold-starts",
+        type=int,
+        default=0,
+        help="Measure init and first response time over this many fresh runtimes instead",
+    )
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    parser.add_argument(
+        "runtime_args", nargs=argparse.REMAINDER, help="Extra arguments for the runtime, after --"
+    )
+    args = parser.parse_args(argv)
+    if args.runtime_args[:1] == ["--"]:
+        args.runtime_args = args.runtime_args[1:]
+    return args
+
+
+def main():
+    args = get_args()
+    if args.cold_starts:
+        result = run_cold_start_benchmark(
+            args.handler, runs=args.cold_starts, runtime_args=args.runtime_args
+        )
+        print(json.dumps(result) if args.json else format_cold_start(result))
+        return
+    results = []
+    for payload_size in args.payload_sizes:
+        result = run_benchmark(
+            args.handler,
+            payload_size,
+            invocations=args.invocations,
+            warmup=args.warmup,
+            runtime_args=args.runtime_args,
+        )
+        if args.json:
+            print(json.dumps(result))
+        results.append(result)
+    if not args.json:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import compileall
+import os
+import py_compile
+import re
+import sys
+
+EXCLUDE = re.compile(r"[/\\](test|tests|idle_test|lib2to3)[/\\]")
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Directories to compile, defaults to sys.path")
+    parser.add_argument("--optimize", type=int, default=0, help="Bytecode optimization level")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = get_args()
+    paths = args.paths or [
+        path for path in sys.path if path and os.path.isdir(path) and path != os.getcwd()
+    ]
+    for path in paths:
+        # unchecked-hash pycs are trusted without stat()ing their sources, store paths never change
+        compiled = compileall.compile_dir(
+            path,
+            quiet=1,
+            rx=EXCLUDE,
+            optimize=args.optimize,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            workers=0,
+        )
+        if not compiled:
+            print(f"Some files in {path} could not be compiled", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
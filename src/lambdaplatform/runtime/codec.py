@@ -0,0 +1,50 @@
+import json
+from typing import Any, Callable, Dict, NamedTuple
+
+
+class Codec(NamedTuple):
+    name: str
+    loads: Callable[[bytes], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def create_json_codec() -> Codec:
+    return Codec("json", json.loads, lambda value: json.dumps(value).encode("utf-8"))
+
+
+def create_orjson_codec() -> Codec:
+    import orjson
+
+    def dumps(value):
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers wider than 64 bits, which the stdlib serializes fine
+            return json.dumps(value).encode("utf-8")
+
+    return Codec("orjson", orjson.loads, dumps)
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    "orjson": create_orjson_codec,
+    "json": create_json_codec,
+}
+
+
+def get_codec(name: str = "auto") -> Codec:
+    if name != "auto":
+        return CODECS[name]()
+    for factory in CODECS.values():
+        try:
+            return factory()
+        except ImportError:
+            pass
+    raise RuntimeError("No JSON codec available")
+
+
+def encode_raw(value) -> bytes:
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if value is None:
+        return b""
+    return value
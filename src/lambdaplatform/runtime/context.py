@@ -0,0 +1,109 @@
+import os
+import time
+from typing import Any, Awaitable, Dict, Iterable, Iterator, Mapping, Optional
+
+CO_VARARGS = 0x04
+
+_current: Optional["Context"] = None
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Context:
+    def __init__(
+        self,
+        request_id: str,
+        deadline_ms: int,
+        *,
+        invoked_function_arn: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        client_context: Optional[str] = None,
+        environment: Mapping[str, str] = os.environ,
+    ):
+        self.aws_request_id = request_id
+        self.deadline_ms = deadline_ms
+        self.invoked_function_arn = invoked_function_arn
+        self.trace_id = trace_id
+        self.client_context = client_context
+        self.function_name = environment.get("AWS_LAMBDA_FUNCTION_NAME")
+        self.function_version = environment.get("AWS_LAMBDA_FUNCTION_VERSION")
+        self.memory_limit_in_mb = environment.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+        self.log_group_name = environment.get("AWS_LAMBDA_LOG_GROUP_NAME")
+        self.log_stream_name = environment.get("AWS_LAMBDA_LOG_STREAM_NAME")
+
+    @classmethod
+    def from_headers(
+        cls, headers: Dict[str, str], *, environment: Mapping[str, str] = os.environ
+    ) -> "Context":
+        return cls(
+            headers["Lambda-Runtime-Aws-Request-Id"],
+            int(headers["Lambda-Runtime-Deadline-Ms"]),
+            invoked_function_arn=headers.get("Lambda-Runtime-Invoked-Function-Arn"),
+            trace_id=headers.get("Lambda-Runtime-Trace-Id"),
+            client_context=headers.get("Lambda-Runtime-Client-Context"),
+            environment=environment,
+        )
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, self.deadline_ms - int(time.time() * 1000))
+
+    def remaining(self, margin: float = 0.0) -> float:
+        # seconds left before the deadline minus a margin reserved for checkpointing/responding
+        return max(0.0, self.deadline_ms / 1000 - time.time() - margin)
+
+    def expired(self, margin: float = 0.0) -> bool:
+        return self.remaining(margin) <= 0
+
+    def check(self, margin: float = 0.0):
+        if self.expired(margin):
+            raise DeadlineExceeded(f"Less than {margin}s left before the invocation deadline")
+
+    def timeout(self, margin: float = 0.0, *, maximum: Optional[float] = None) -> float:
+        # for socket and client timeouts, so outbound calls give up before Lambda kills us
+        self.check(margin)
+        remaining = self.remaining(margin)
+        return remaining if maximum is None else min(remaining, maximum)
+
+    def iterate(self, iterable: Iterable, margin: float = 0.0) -> Iterator:
+        # stops early instead of raising, check expired() afterwards to checkpoint the rest
+        for item in iterable:
+            if self.expired(margin):
+                return
+            yield item
+
+    async def wait_for(self, awaitable: Awaitable, margin: float = 0.0) -> Any:
+        import asyncio
+
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout(margin))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(
+                f"Less than {margin}s left before the invocation deadline"
+            ) from None
+
+
+def accepts_context(callable) -> bool:
+    # handlers opt in by taking a second positional argument, like the AWS provided runtimes
+    function = getattr(callable, "__func__", callable)
+    code = getattr(function, "__code__", None)
+    bound = function is not callable
+    if code is None:
+        code = getattr(getattr(callable, "__call__", None), "__code__", None)
+        bound = True
+    if code is None:
+        return False
+    return bool(code.co_flags & CO_VARARGS) or code.co_argcount - bound >= 2
+
+
+def current() -> Optional[Context]:
+    return _current
+
+
+def set_current(context: Optional[Context]):
+    global _current
+    _current = context
+    if context is not None and context.trace_id:
+        # picked up by the X-Ray SDK the same way as on the AWS provided runtimes
+        os.environ["_X_AMZN_TRACE_ID"] = context.trace_id
@@ -0,0 +1,57 @@
+import importlib
+import os
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from .context import accepts_context
+
+
+def load_handler(spec: str) -> Callable:
+    module_name, callable_name = spec.split(":", 1)
+    return getattr(importlib.import_module(module_name), callable_name)
+
+
+def route_from_event(event) -> Optional[str]:
+    if not isinstance(event, dict):
+        return None
+    if "RequestType" in event and "LogicalResourceId" in event:
+        # CloudFormation custom resources all share one resource type, the logical id differs
+        return event["LogicalResourceId"]
+    if "detail-type" in event and "source" in event:
+        return event["source"]
+    records = event.get("Records")
+    if isinstance(records, list) and records and isinstance(records[0], dict):
+        return records[0].get("eventSource") or records[0].get("EventSource")
+    return None
+
+
+class Dispatcher:
+    # modules behind a route are only imported once it is first hit, then cached for the container
+    def __init__(
+        self,
+        routes: Dict[str, str],
+        *,
+        select: Callable[[object], Optional[str]] = route_from_event,
+        default: Optional[str] = None,
+        environment: Mapping[str, str] = os.environ,
+    ):
+        self.routes = routes
+        self.select = select
+        self.default = default
+        self.environment = environment
+        self.handlers: Dict[str, Tuple[Callable, bool]] = {}
+
+    def get_route(self, event) -> str:
+        route = self.environment.get("LAMBDAPLATFORM_ROUTE") or self.select(event) or self.default
+        if route not in self.routes:
+            raise LookupError(f"No handler for route {route!r}")
+        return route
+
+    def resolve(self, route: str) -> Tuple[Callable, bool]:
+        if route not in self.handlers:
+            handler = load_handler(self.routes[route])
+            self.handlers[route] = (handler, accepts_context(handler))
+        return self.handlers[route]
+
+    def __call__(self, event, context):
+        handler, pass_context = self.resolve(self.get_route(event))
+        return handler(event, context) if pass_context else handler(event)
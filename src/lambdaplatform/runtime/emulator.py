@@ -0,0 +1,275 @@
+import argparse
+import base64
+import http.server
+import itertools
+import json
+import pathlib
+import queue
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+API_PREFIX = "/2018-06-01/runtime"
+EXTENSION_API_PREFIX = "/2020-01-01/extension"
+
+
+class Invocation:
+    def __init__(self, payload: bytes, *, timeout: float = 30.0, headers=None):
+        self.request_id = str(uuid.uuid4())
+        self.payload = payload
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.submitted_at = time.perf_counter()
+        self.dispatched_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.response: Optional[bytes] = None
+        self.error: Optional[bytes] = None
+        self.done = threading.Event()
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.dispatched_at is None or self.completed_at is None:
+            return None
+        return self.completed_at - self.dispatched_at
+
+    def complete(self, *, response=None, error=None):
+        self.completed_at = time.perf_counter()
+        self.response = response
+        self.error = error
+        self.done.set()
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        # headers and body go out in a single write to avoid delayed ACK stalls on keep-alive
+        self._headers_buffer.append(b"\r\n")
+        self._headers_buffer.append(body)
+        self.flush_headers()
+
+    def read_body(self) -> Tuple[bytes, Dict[str, str]]:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0))), {}
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if not size:
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        trailers = {}
+        while True:
+            line = self.rfile.readline().strip()
+            if not line:
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            trailers[key.strip()] = value.strip()
+        return b"".join(chunks), trailers
+
+    def do_GET(self):
+        if self.path == f"{EXTENSION_API_PREFIX}/event/next":
+            event = self.server.emulator.next_extension_event(
+                self.headers.get("Lambda-Extension-Identifier")
+            )
+            if event is None:
+                return self.send(403)
+            return self.send(200, json.dumps(event).encode("utf-8"))
+        if self.path != f"{API_PREFIX}/invocation/next":
+            return self.send(404)
+        invocation = self.server.emulator.next_invocation()
+        if invocation is None:
+            return self.send(500, b'{"errorType":"ShutdownInProgress"}')
+        self.send(
+            200,
+            invocation.payload,
+            {
+                "Content-Type": "application/json",
+                "Lambda-Runtime-Aws-Request-Id": invocation.request_id,
+                "Lambda-Runtime-Deadline-Ms": str(int((time.time() + invocation.timeout) * 1000)),
+                "Lambda-Runtime-Invoked-Function-Arn": self.server.emulator.function_arn,
+                "Lambda-Runtime-Trace-Id": f"Root=1-{uuid.uuid4().hex[:8]}-{uuid.uuid4().hex[:24]}",
+                **invocation.headers,
+            },
+        )
+
+    def do_POST(self):
+        emulator = self.server.emulator
+        body, trailers = self.read_body()
+        if self.path == "/2015-03-31/functions/function/invocations":
+            invocation = emulator.invoke(body)
+            if invocation.error is not None:
+                return self.send(200, invocation.error, {"X-Amz-Function-Error": "Unhandled"})
+            return self.send(200, invocation.response or b"")
+        if self.path == f"{EXTENSION_API_PREFIX}/register":
+            identifier = emulator.register_extension(self.headers["Lambda-Extension-Name"])
+            return self.send(
+                200,
+                json.dumps({"functionName": "local", "functionVersion": "$LATEST"}).encode("utf-8"),
+                {"Lambda-Extension-Identifier": identifier},
+            )
+        if self.path == f"{API_PREFIX}/init/error":
+            emulator.init_error = body
+            return self.send(202)
+        prefix, _, rest = self.path.partition(f"{API_PREFIX}/invocation/")
+        request_id, _, action = rest.partition("/")
+        invocation = emulator.in_flight.pop(request_id, None) if not prefix else None
+        if invocation is None or action not in {"response", "error"}:
+            return self.send(404)
+        if "Lambda-Runtime-Function-Error-Body" in trailers:
+            error = base64.b64decode(trailers["Lambda-Runtime-Function-Error-Body"])
+            invocation.complete(response=body, error=error)
+        else:
+            invocation.complete(**{action: body})
+        self.send(202)
+
+
+class EmulatorServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # runtimes under test are routinely killed mid-poll
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class RuntimeApiEmulator:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, *, function_arn: Optional[str] = None
+    ):
+        self.server = EmulatorServer((host, port), RequestHandler)
+        self.server.emulator = self
+        self.function_arn = function_arn or "arn:aws:lambda:us-east-1:000000000000:function:local"
+        self.pending: "queue.Queue[Optional[Invocation]]" = queue.Queue()
+        self.in_flight: Dict[str, Invocation] = {}
+        self.init_error: Optional[bytes] = None
+        self.first_poll_at: Optional[float] = None
+        self.polled = threading.Event()
+        self.extensions: Dict[str, "queue.Queue[Optional[dict]]"] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.pending.put(None)
+        for events in self.extensions.values():
+            events.put(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def next_invocation(self) -> Optional[Invocation]:
+        if not self.polled.is_set():
+            self.first_poll_at = time.perf_counter()
+            self.polled.set()
+        invocation = self.pending.get()
+        if invocation is None:
+            # wake any other long-polling runtime as well
+            self.pending.put(None)
+            return None
+        invocation.dispatched_at = time.perf_counter()
+        self.in_flight[invocation.request_id] = invocation
+        for events in self.extensions.values():
+            events.put(
+                {
+                    "eventType": "INVOKE",
+                    "requestId": invocation.request_id,
+                    "invokedFunctionArn": self.function_arn,
+                    "deadlineMs": int((time.time() + invocation.timeout) * 1000),
+                }
+            )
+        return invocation
+
+    def register_extension(self, name: str) -> str:
+        identifier = str(uuid.uuid4())
+        self.extensions[identifier] = queue.Queue()
+        return identifier
+
+    def next_extension_event(self, identifier: Optional[str]) -> Optional[dict]:
+        events = self.extensions.get(identifier)
+        if events is None:
+            return None
+        event = events.get()
+        if event is None:
+            events.put(None)
+        return event
+
+    def submit(self, payload: bytes, **kwargs) -> Invocation:
+        invocation = Invocation(payload, **kwargs)
+        self.pending.put(invocation)
+        return invocation
+
+    def invoke(self, payload: bytes, **kwargs) -> Invocation:
+        invocation = self.submit(payload, **kwargs)
+        invocation.done.wait()
+        return invocation
+
+    def replay(
+        self, payloads: Iterable[bytes], *, rate: Optional[float] = None
+    ) -> Iterator[Invocation]:
+        started_at = time.perf_counter()
+        for idx, payload in enumerate(payloads):
+            if rate:
+                time.sleep(max(0.0, started_at + idx / rate - time.perf_counter()))
+            yield self.submit(payload)
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("events", nargs="*", type=pathlib.Path, help="Recorded event files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--rate", type=float, help="Events per second to replay")
+    parser.add_argument("--loop", action="store_true", help="Replay events until interrupted")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = get_args()
+    with RuntimeApiEmulator(args.host, args.port) as emulator:
+        print(f"AWS_LAMBDA_RUNTIME_API={emulator.address}", file=sys.stderr)
+        payloads = [path.read_bytes() for path in args.events]
+        if args.loop and payloads:
+            payloads = itertools.cycle(payloads)
+        try:
+            for invocation in emulator.replay(payloads, rate=args.rate):
+                invocation.done.wait()
+                print(
+                    json.dumps(
+                        {
+                            "requestId": invocation.request_id,
+                            "durationMs": round(invocation.duration * 1000, 3),
+                            "status": "error" if invocation.error is not None else "success",
+                        }
+                    )
+                )
+            if not args.events:
+                threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import atexit
+import contextlib
+import datetime
+import io
+import json
+import logging
+import sys
+import threading
+from typing import List, Optional, Union
+
+TEXT_FORMAT = "[%(levelname)s]\t%(asctime)s\t%(requestId)s\t%(name)s\t%(message)s"
+
+RECORD_ATTRIBUTES = {
+    *vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None)),
+    "message",
+    "asctime",
+    "requestId",
+}
+
+# one invocation runs at a time per container, so a global is visible to the handler's threads too
+current_request_id: Optional[str] = None
+
+_structured_logging: Optional["StructuredLogging"] = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.requestId = current_request_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        document = {
+            "timestamp": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "requestId": getattr(record, "requestId", None),
+        }
+        document.update(
+            (key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+class BufferedStream(io.TextIOBase):
+    def __init__(self, stream, limit: int):
+        self.stream = stream
+        self.limit = limit
+        self.chunks: List[str] = []
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self.lock:
+            self.chunks.append(text)
+            self.size += len(text)
+            full = self.size >= self.limit
+        if full:
+            self.drain()
+        return len(text)
+
+    def flush(self):
+        # explicit flushes from print() and logging would defeat the buffer, see drain()
+        pass
+
+    def drain(self):
+        with self.lock:
+            text = "".join(self.chunks)
+            self.chunks.clear()
+            self.size = 0
+        if text:
+            self.stream.write(text)
+            self.stream.flush()
+
+
+class StructuredLogging:
+    def __init__(
+        self, *, level: Union[int, str], json_format: bool, buffer_bytes: int, stream=None
+    ):
+        self.level = level
+        self.stream = BufferedStream(stream or sys.stdout, buffer_bytes)
+        handler = logging.StreamHandler(self.stream)
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+        root = logging.getLogger()
+        root.handlers[:] = [handler]
+        root.setLevel(level)
+        sys.stdout = self.stream
+        atexit.register(self.flush)
+
+    def flush(self):
+        self.stream.drain()
+
+    @contextlib.contextmanager
+    def invocation(self, request_id: str, *, client_context: Optional[str] = None):
+        global current_request_id
+        current_request_id = request_id
+        level = level_from_client_context(client_context)
+        if level:
+            logging.getLogger().setLevel(level)
+        try:
+            yield
+        finally:
+            self.flush()
+            logging.getLogger().setLevel(self.level)
+            current_request_id = None
+
+
+def configure(**kwargs) -> StructuredLogging:
+    global _structured_logging
+    _structured_logging = StructuredLogging(**kwargs)
+    return _structured_logging
+
+
+def set_level(level: Union[int, str]):
+    logging.getLogger().setLevel(level)
+    if _structured_logging is not None:
+        _structured_logging.level = level
+
+
+def level_from_client_context(client_context: Optional[str]) -> Optional[str]:
+    if not client_context:
+        return None
+    try:
+        level = str(json.loads(client_context)["custom"]["logLevel"]).upper()
+    except (ValueError, TypeError, KeyError):
+        return None
+    return level if isinstance(logging.getLevelName(level), int) else None
@@ -0,0 +1,63 @@
+from typing import Dict, Union
+
+MIB = 1024 * 1024
+
+
+def read_process_memory(pid: Union[int, str] = "self") -> Dict[str, int]:
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            status = f.read()
+    except FileNotFoundError:
+        return memory
+    for key in ("VmRSS", "VmHWM"):
+        start = status.find(key.encode("ascii") + b":")
+        if start != -1:
+            memory[key] = int(status[start + len(key) + 1 : status.index(b"kB", start)]) * 1024
+    return memory
+
+
+def reset_peak_rss() -> bool:
+    # writing 5 to clear_refs resets VmHWM to the current RSS, each side costs ~10 us
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class MemoryTracker:
+    def __init__(self, *, tracemalloc_every: int = 0):
+        self.tracemalloc_every = tracemalloc_every
+        self.invocations = 0
+        self.resettable = True
+        self.tracing = False
+
+    def start(self):
+        if self.resettable:
+            # without a reset MaxRss is the peak since the container started
+            self.resettable = reset_peak_rss()
+        self.invocations += 1
+        # tracemalloc slows allocations down noticeably, so only every nth invocation pays for it
+        self.tracing = (
+            self.tracemalloc_every > 0 and (self.invocations - 1) % self.tracemalloc_every == 0
+        )
+        if self.tracing:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def stop(self) -> Dict[str, float]:
+        memory = read_process_memory()
+        values = {
+            "MaxRss": memory.get("VmHWM", 0) / MIB,
+            "Rss": memory.get("VmRSS", 0) / MIB,
+        }
+        if self.tracing:
+            import tracemalloc
+
+            values["PythonHeapPeak"] = tracemalloc.get_traced_memory()[1] / MIB
+            tracemalloc.stop()
+            self.tracing = False
+        return values
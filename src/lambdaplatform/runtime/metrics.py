@@ -0,0 +1,109 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# EMF caps the number of values a single metric may carry in one document
+MAX_VALUES_PER_METRIC = 100
+
+UNITS = {
+    "ColdStart": "Count",
+    "MaxRss": "Megabytes",
+    "Rss": "Megabytes",
+    "PythonHeapPeak": "Megabytes",
+}
+
+# counters library code bumps during an invocation, added to that invocation's metrics
+_counters: Dict[str, float] = {}
+# batch workers, scatter and cache users increment from several threads at once
+_counters_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1, *, unit: str = "Count"):
+    UNITS.setdefault(name, unit)
+    with _counters_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def take_counters() -> Dict[str, float]:
+    with _counters_lock:
+        counters = dict(_counters)
+        _counters.clear()
+    return counters
+
+
+class MetricsEmitter:
+    def __init__(
+        self,
+        namespace: str,
+        dimensions: Dict[str, str],
+        *,
+        flush_every: int = 1,
+        stream=None,
+    ):
+        self.namespace = namespace
+        self.dimensions = dimensions
+        self.flush_every = max(1, flush_every)
+        self.stream = stream
+        self.values: Dict[str, List[float]] = {}
+        # properties every pending record shares, like MemorySize and Architecture for the tuner
+        self.properties: Optional[Dict] = None
+        self.pending = 0
+        if self.flush_every > 1:
+            atexit.register(self.flush)
+
+    def record(self, values: Dict[str, float], *, properties: Optional[Dict] = None):
+        if self.flush_every == 1:
+            self.emit({name: round(value, 3) for name, value in values.items()}, properties)
+            return
+        for name, value in values.items():
+            self.values.setdefault(name, []).append(round(value, 3))
+        properties = properties or {}
+        if self.properties is None:
+            self.properties = dict(properties)
+        else:
+            self.properties = {
+                name: value
+                for name, value in self.properties.items()
+                if name in properties and properties[name] == value
+            }
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        values, self.values, self.pending = self.values, {}, 0
+        properties, self.properties = self.properties, None
+        while values:
+            self.emit(
+                {name: series[:MAX_VALUES_PER_METRIC] for name, series in values.items()},
+                properties,
+            )
+            values = {
+                name: series[MAX_VALUES_PER_METRIC:]
+                for name, series in values.items()
+                if len(series) > MAX_VALUES_PER_METRIC
+            }
+
+    def emit(self, values: Dict, properties: Optional[Dict] = None):
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": UNITS.get(name, "Milliseconds")}
+                            for name in values
+                        ],
+                    }
+                ],
+            },
+            **self.dimensions,
+            **(properties or {}),
+            **values,
+        }
+        print(json.dumps(document, separators=(",", ":")), file=self.stream or sys.stdout)
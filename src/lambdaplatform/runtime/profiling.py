@@ -0,0 +1,89 @@
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+class ImportRecord:
+    def __init__(self, module: str, parent: Optional[str], find_time: float):
+        self.module = module
+        self.parent = parent
+        self.find_time = find_time
+        self.cumulative_time = find_time
+        self.children_time = 0.0
+
+    @property
+    def self_time(self) -> float:
+        return self.cumulative_time - self.children_time
+
+
+class TimedLoader:
+    def __init__(self, loader, profiler: "ImportProfiler", module: str, find_time: float):
+        self.loader = loader
+        self.profiler = profiler
+        self.module = module
+        self.find_time = find_time
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self.profiler.stack
+        record = ImportRecord(self.module, stack[-1].module if stack else None, self.find_time)
+        self.profiler.records.append(record)
+        stack.append(record)
+        started_at = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            stack.pop()
+            record.cumulative_time += time.perf_counter() - started_at
+            if stack:
+                stack[-1].children_time += record.cumulative_time
+
+
+class ImportProfiler:
+    def __init__(self):
+        self.records: List[ImportRecord] = []
+        self.stack: List[ImportRecord] = []
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        started_at = time.perf_counter()
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = TimedLoader(spec.loader, self, fullname, time.perf_counter() - started_at)
+        return spec
+
+    def report(self, *, limit: int = 50) -> Dict:
+        top_level = [record for record in self.records if record.parent is None]
+        slowest = sorted(self.records, key=lambda record: record.self_time, reverse=True)
+        return {
+            "type": "ImportProfile",
+            "totalMs": round(sum(record.cumulative_time for record in top_level) * 1000, 3),
+            "moduleCount": len(self.records),
+            "modules": [
+                {
+                    "module": record.module,
+                    "parent": record.parent,
+                    "selfMs": round(record.self_time * 1000, 3),
+                    "cumulativeMs": round(record.cumulative_time * 1000, 3),
+                }
+                for record in slowest[:limit]
+            ],
+        }
@@ -0,0 +1,70 @@
+import base64
+import collections.abc
+import itertools
+import sys
+import traceback
+from typing import Any, Callable, Dict, Iterator
+
+from .api import RuntimeApiConnection, format_error
+
+CHUNK_SIZE = 64 * 1024
+
+STREAMING_HEADERS = {
+    "Lambda-Runtime-Function-Response-Mode": "streaming",
+    "Trailer": "Lambda-Runtime-Function-Error-Type, Lambda-Runtime-Function-Error-Body",
+}
+
+
+def is_stream(result) -> bool:
+    return hasattr(result, "read") or isinstance(result, collections.abc.Iterator)
+
+
+def iter_chunks(result, encode: Callable[[Any], bytes]) -> Iterator[bytes]:
+    if hasattr(result, "read"):
+        try:
+            while True:
+                chunk = result.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    for chunk in result:
+        if isinstance(chunk, str):
+            yield chunk.encode("utf-8")
+        elif isinstance(chunk, (bytes, bytearray, memoryview)):
+            yield chunk
+        else:
+            yield encode(chunk)
+
+
+def error_trailers(ex: BaseException) -> Dict[str, str]:
+    return {
+        "Lambda-Runtime-Function-Error-Type": type(ex).__qualname__,
+        "Lambda-Runtime-Function-Error-Body": base64.b64encode(format_error(ex)).decode("ascii"),
+    }
+
+
+def post_stream(
+    connection: RuntimeApiConnection, request_id: str, result, encode: Callable[[Any], bytes]
+):
+    chunks = iter_chunks(result, encode)
+    # failures before the first chunk still go through the regular error endpoint
+    first_chunk = next(chunks, b"")
+    failure = []
+
+    def guarded_chunks():
+        try:
+            yield from itertools.chain([first_chunk], chunks)
+        except Exception as ex:
+            traceback.print_exc(file=sys.stderr)
+            failure.append(ex)
+
+    connection.request_chunked(
+        "POST",
+        f"/invocation/{request_id}/response",
+        guarded_chunks(),
+        headers=STREAMING_HEADERS,
+        trailers=lambda: error_trailers(failure[0]) if failure else {},
+    )
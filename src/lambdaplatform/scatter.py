@@ -0,0 +1,252 @@
+import importlib
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from .runtime import aio
+from .runtime.metrics import increment
+
+if TYPE_CHECKING:
+    import concurrent.futures
+
+# imported by functions that register tasks, concurrent.futures (and with it logging) and random
+# are only imported once something actually scatters
+
+# events carrying this key are answered by the runtime itself instead of the function's handler
+EVENT_KEY = "lambdaplatform.scatter"
+DEFAULT_QUALIFIER = "latest"
+DEFAULT_MAX_CONCURRENCY = 32
+
+_tasks: Dict[str, Callable] = {}
+
+
+class ScatterError(Exception):
+    def __init__(self, chunk: int, message: str):
+        super().__init__(f"Chunk {chunk} failed: {message}")
+        self.chunk = chunk
+
+
+def task(function: Callable) -> Callable:
+    # only registered functions can be run by a scatter event, not any importable callable
+    _tasks[get_task_name(function)] = function
+    return function
+
+
+def get_task_name(function: Callable) -> str:
+    return f"{function.__module__}:{function.__qualname__}"
+
+
+def get_task(name: str) -> Callable:
+    # names come from events, nothing is imported on their behalf, the handler module importing
+    # its tasks at init registers them
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"{name} is not a registered scatter task") from None
+
+
+def import_task_module(name: str):
+    # for pool workers that do not inherit the registry, the name comes from the parent's scatter()
+    importlib.import_module(name.partition(":")[0])
+
+
+def is_scatter_event(event) -> bool:
+    return isinstance(event, dict) and EVENT_KEY in event
+
+
+def handle(event: Mapping) -> dict:
+    request = event[EVENT_KEY]
+    function = get_task(request["task"])
+    results = []
+    for item in request["items"]:
+        result = function(item)
+        if aio.is_awaitable(result):
+            result = aio.run(result)
+        results.append(result)
+    return {"results": results}
+
+
+def encode_request(name: str, items: Sequence) -> bytes:
+    return json.dumps({EVENT_KEY: {"task": name, "items": list(items)}}).encode("utf-8")
+
+
+def run_encoded(payload: bytes) -> bytes:
+    # both backends round trip through JSON, so local runs fail where Lambda invocations would
+    return json.dumps(handle(json.loads(payload))).encode("utf-8")
+
+
+class AdaptiveLimit:
+    # additive increase, multiplicative decrease: throttling halves the invocations in flight,
+    # every success grows the limit by about one per limit's worth of completed invocations
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, *, throttled: bool = False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class LambdaBackend:
+    def __init__(
+        self,
+        function_name: Optional[str] = None,
+        *,
+        qualifier: str = DEFAULT_QUALIFIER,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        attempts: int = 8,
+        backoff: float = 0.1,
+        environment: Mapping[str, str] = os.environ,
+    ):
+        # a function scatters to its own alias unless told otherwise
+        function_name = function_name or environment.get(
+            "LAMBDAPLATFORM_SCATTER_FUNCTION", environment.get("AWS_LAMBDA_FUNCTION_NAME")
+        )
+        if not function_name:
+            raise ValueError("No function to scatter to, set LAMBDAPLATFORM_SCATTER_FUNCTION")
+        self.function_name = function_name
+        self.qualifier = qualifier
+        self.max_concurrency = max_concurrency
+        self.attempts = attempts
+        self.backoff = backoff
+
+    def get_client(self):
+        import botocore.config
+
+        from . import clients
+
+        # throttling is handled here, botocore retrying as well would defeat the adaptive limit,
+        # and a synchronous invocation may legitimately take the whole 15 minute maximum
+        return clients.client(
+            "lambda",
+            config=botocore.config.Config(
+                retries={"total_max_attempts": 1},
+                read_timeout=905,
+                max_pool_connections=self.max_concurrency,
+            ),
+        )
+
+    def invoke(self, client, limit: AdaptiveLimit, chunk: int, payload: bytes) -> bytes:
+        import random
+
+        attempt = 0
+        while True:
+            limit.acquire()
+            try:
+                response = client.invoke(
+                    FunctionName=self.function_name, Qualifier=self.qualifier, Payload=payload
+                )
+            except client.exceptions.TooManyRequestsException:
+                limit.release(throttled=True)
+                attempt += 1
+                if attempt >= self.attempts:
+                    raise ScatterError(chunk, "throttled") from None
+                increment("ScatterThrottles")
+                time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                continue
+            except BaseException:
+                limit.release()
+                raise
+            limit.release()
+            body = response["Payload"].read()
+            if "FunctionError" in response:
+                raise ScatterError(chunk, body.decode("utf-8", "replace"))
+            return body
+
+    def run(self, name: str, chunks: List[Sequence]) -> List[List]:
+        import concurrent.futures
+
+        client = self.get_client()
+        limit = AdaptiveLimit(self.max_concurrency)
+        with concurrent.futures.ThreadPoolExecutor(
+            min(self.max_concurrency, len(chunks)) or 1, thread_name_prefix="lambdaplatform-scatter"
+        ) as executor:
+            futures = [
+                executor.submit(self.invoke, client, limit, idx, encode_request(name, chunk))
+                for idx, chunk in enumerate(chunks)
+            ]
+            return gather(futures)
+
+
+class LocalBackend:
+    # the same handler code in a process pool, for running scatter offline
+    def __init__(self, *, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+
+    def run(self, name: str, chunks: List[Sequence]) -> List[List]:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(
+            self.max_workers, initializer=import_task_module, initargs=(name,)
+        ) as executor:
+            futures = [
+                executor.submit(run_encoded, encode_request(name, chunk)) for chunk in chunks
+            ]
+            return gather(futures)
+
+
+def gather(futures: List["concurrent.futures.Future"]) -> List[List]:
+    results = []
+    try:
+        for idx, future in enumerate(futures):
+            try:
+                body = future.result()
+            except ScatterError:
+                raise
+            except Exception as ex:
+                raise ScatterError(idx, f"{type(ex).__qualname__}: {ex}") from ex
+            results.append(json.loads(body)["results"])
+    except BaseException:
+        # fail fast, chunks that have not started yet are not invoked anymore
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def get_backend(environment: Mapping[str, str] = os.environ) -> Union[LambdaBackend, LocalBackend]:
+    backend = environment.get("LAMBDAPLATFORM_SCATTER_BACKEND")
+    if backend is None:
+        in_lambda = "AWS_LAMBDA_FUNCTION_NAME" in environment
+        backend = (
+            "lambda" if in_lambda or "LAMBDAPLATFORM_SCATTER_FUNCTION" in environment else "local"
+        )
+    if backend == "lambda":
+        return LambdaBackend(environment=environment)
+    if backend == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown scatter backend {backend!r}")
+
+
+def scatter(
+    function: Callable,
+    items: Iterable,
+    *,
+    chunk_size: int = 1,
+    backend: Optional[Union[LambdaBackend, LocalBackend]] = None,
+) -> List:
+    # runs a registered task on every item in parallel invocations, results come back in order
+    name = get_task_name(function)
+    if _tasks.get(name) is not function:
+        raise ValueError(f"{name} is not a registered scatter task, decorate it with @task")
+    items = list(items)
+    chunks = [items[idx : idx + chunk_size] for idx in range(0, len(items), chunk_size)]
+    if not chunks:
+        return []
+    results = (backend or get_backend()).run(name, chunks)
+    return [result for chunk in results for result in chunk]
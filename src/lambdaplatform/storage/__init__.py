@@ -0,0 +1,9 @@
+import os
+import pathlib
+
+# where templates.lambda_function mounts the shared Elastic File System access point
+MOUNT_PATH = "/mnt/storage"
+
+
+def get_storage_path(*parts: str) -> pathlib.Path:
+    return pathlib.Path(os.environ.get("LAMBDAPLATFORM_STORAGE_PATH", MOUNT_PATH), *parts)
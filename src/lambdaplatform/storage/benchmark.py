@@ -0,0 +1,186 @@
+import argparse
+import json
+import multiprocessing
+import pathlib
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Dict, List
+
+from ..runtime import background
+from ..runtime.benchmark import percentile
+from ..runtime.metrics import take_counters
+from .sqlite import Database
+
+
+def run_worker(
+    path: str,
+    seed: int,
+    *,
+    duration: float,
+    read_ratio: float,
+    batch_size: int,
+    operations_per_invocation: int,
+    keys: int,
+    value_bytes: int,
+    results: "multiprocessing.Queue",
+):
+    rng = random.Random(seed)
+    database = Database(path, batch_size=batch_size)
+    value = b"x" * value_bytes
+    reads = writes = errors = 0
+    latencies: List[float] = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        # one simulated invocation, pending writes are committed when background work drains
+        started_at = time.perf_counter()
+        try:
+            for _ in range(operations_per_invocation):
+                key = rng.randrange(keys)
+                if rng.random() < read_ratio:
+                    database.read("SELECT value FROM kv WHERE key = ?", (key,))
+                    reads += 1
+                else:
+                    database.write("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, value))
+                    writes += 1
+            background.drain()
+            database.flush()
+        except sqlite3.OperationalError:
+            errors += 1
+            database.pending.clear()
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    results.put(
+        {
+            "reads": reads,
+            "writes": writes,
+            "errors": errors,
+            "latencies": latencies,
+            "busy_retries": take_counters().get("SqliteBusyRetries", 0),
+        }
+    )
+
+
+def run_benchmark(
+    path: pathlib.Path,
+    *,
+    processes: int,
+    duration: float,
+    read_ratio: float,
+    batch_size: int,
+    operations_per_invocation: int,
+    keys: int = 10_000,
+    value_bytes: int = 256,
+) -> Dict[str, float]:
+    for stale in (path, path.with_name(f"{path.name}-journal")):
+        stale.unlink(missing_ok=True)
+    Database(path).run_transaction(
+        lambda connection: connection.execute(
+            "CREATE TABLE kv (key INTEGER PRIMARY KEY, value BLOB NOT NULL)"
+        )
+    )
+    results: "multiprocessing.Queue" = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(str(path), seed),
+            kwargs={
+                "duration": duration,
+                "read_ratio": read_ratio,
+                "batch_size": batch_size,
+                "operations_per_invocation": operations_per_invocation,
+                "keys": keys,
+                "value_bytes": value_bytes,
+                "results": results,
+            },
+        )
+        for seed in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    latencies = [latency for result in collected for latency in result["latencies"]]
+    return {
+        "processes": processes,
+        "batch_size": batch_size,
+        "reads_per_s": sum(result["reads"] for result in collected) / duration,
+        "writes_per_s": sum(result["writes"] for result in collected) / duration,
+        "invocation_p50_ms": percentile(latencies, 50),
+        "invocation_p99_ms": percentile(latencies, 99),
+        "busy_retries": sum(result["busy_retries"] for result in collected),
+        "errors": sum(result["errors"] for result in collected),
+    }
+
+
+def format_table(results: List[Dict[str, float]]) -> str:
+    columns = [
+        ("processes", "procs", "{:>6d}"),
+        ("batch_size", "batch", "{:>6d}"),
+        ("reads_per_s", "reads/s", "{:>9.0f}"),
+        ("writes_per_s", "writes/s", "{:>9.0f}"),
+        ("invocation_p50_ms", "p50 ms", "{:>9.3f}"),
+        ("invocation_p99_ms", "p99 ms", "{:>9.3f}"),
+        ("busy_retries", "retries", "{:>8d}"),
+        ("errors", "errors", "{:>7d}"),
+    ]
+    lines = [" ".join(f"{title:>{len(fmt.format(0))}}" for _, title, fmt in columns)]
+    for result in results:
+        lines.append(" ".join(fmt.format(result[key]) for key, _, fmt in columns))
+    return "\n".join(lines)
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Concurrent SQLite read/write throughput, e.g. on the EFS mount",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--directory",
+        type=pathlib.Path,
+        help="Where to create the database, a temporary local directory stands in by default",
+    )
+    parser.add_argument(
+        "--processes",
+        type=lambda value: [int(count) for count in value.split(",")],
+        default=[1, 4, 16],
+        help="Comma separated numbers of concurrent containers to simulate",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[1, 100],
+        help="Comma separated numbers of writes grouped into one transaction",
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--operations-per-invocation", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON lines")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory(prefix=f"{__package__}.") as temp_dir:
+        directory = args.directory or pathlib.Path(temp_dir)
+        results = []
+        for processes in args.processes:
+            for batch_size in args.batch_sizes:
+                result = run_benchmark(
+                    directory / "benchmark.sqlite3",
+                    processes=processes,
+                    duration=args.duration,
+                    read_ratio=args.read_ratio,
+                    batch_size=batch_size,
+                    operations_per_invocation=args.operations_per_invocation,
+                )
+                if args.json:
+                    print(json.dumps(result))
+                results.append(result)
+    if not args.json:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
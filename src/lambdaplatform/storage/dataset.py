@@ -0,0 +1,152 @@
+import bisect
+import hashlib
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from . import get_storage_path, local
+
+# index layout, little endian: magic, record count, sorted 64-bit key hashes, count + 1 record
+# offsets relative to the data section, then records of a 32-bit key length, key and value
+MAGIC = b"LPIDX001"
+HEADER = struct.Struct("<8sQ")
+
+Key = Union[str, bytes]
+
+_mappings: Dict[pathlib.Path, Tuple[int, int, mmap.mmap]] = {}
+_lock = threading.Lock()
+
+
+def open_mapped(source: Union[str, pathlib.Path], *, cached: bool = True) -> memoryview:
+    # pages are shared with the page cache instead of being copied onto the Python heap, a local
+    # copy keeps page faults off NFS, mappings are kept for warm invocations until the file changes
+    path = local.get_path(source) if cached else get_storage_path(source)
+    with _lock:
+        stat = os.stat(path)
+        mapping = _mappings.get(path)
+        if mapping is None or mapping[:2] != (stat.st_ino, stat.st_mtime_ns):
+            if stat.st_size == 0:
+                return memoryview(b"")
+            with open(path, "rb") as f:
+                mapping = (
+                    stat.st_ino,
+                    stat.st_mtime_ns,
+                    mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ),
+                )
+            _mappings[path] = mapping
+        return memoryview(mapping[2])
+
+
+def release(path: pathlib.Path):
+    with _lock:
+        mapping = _mappings.pop(path, None)
+    if mapping is None:
+        return
+    try:
+        mapping[2].close()
+    except BufferError:
+        # indexes still hold views of it, the mapping goes once the last of them is dropped
+        pass
+
+
+local.on_remove(release)
+
+
+def encode_key(key: Key) -> bytes:
+    return key.encode("utf-8") if isinstance(key, str) else key
+
+
+def hash_key(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def write_index(path: Union[str, pathlib.Path], items: Iterable[Tuple[Key, bytes]]):
+    path = pathlib.Path(path)
+    records = sorted((hash_key(key), key, value) for key, value in map(encode_index_item, items))
+    offsets = [0]
+    for _, key, value in records:
+        offsets.append(offsets[-1] + 4 + len(key) + len(value))
+    # written aside and renamed, so readers on other containers never map a partial index
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(records)))
+            f.write(struct.pack(f"<{len(records)}Q", *(digest for digest, _, _ in records)))
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            for _, key, value in records:
+                f.write(struct.pack("<I", len(key)))
+                f.write(key)
+                f.write(value)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def encode_index_item(item: Tuple[Key, bytes]) -> Tuple[bytes, bytes]:
+    key, value = item
+    return encode_key(key), bytes(value)
+
+
+class Index:
+    # lookups binary search the mapped hash array, no per-record Python objects are ever built
+    def __init__(self, buffer: memoryview, *, name: str = "buffer"):
+        if sys.byteorder != "little":
+            raise RuntimeError("Indexes can only be mapped on little endian hosts")
+        # an empty file maps to an empty buffer, too short for even the header
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{name} is not a lambdaplatform index")
+        magic, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a lambdaplatform index")
+        hashes_end = HEADER.size + count * 8
+        offsets_end = hashes_end + (count + 1) * 8
+        if len(buffer) < offsets_end:
+            raise ValueError(f"{name} is a truncated lambdaplatform index")
+        self.count = count
+        self.hashes = buffer[HEADER.size : hashes_end].cast("Q")
+        self.offsets = buffer[hashes_end:offsets_end].cast("Q")
+        self.data = buffer[offsets_end:]
+
+    @classmethod
+    def open(cls, source: Union[str, pathlib.Path], *, cached: bool = True) -> "Index":
+        return cls(open_mapped(source, cached=cached), name=str(source))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, idx: int) -> Tuple[memoryview, memoryview]:
+        start = self.offsets[idx]
+        (key_length,) = struct.unpack_from("<I", self.data, start)
+        key_end = start + 4 + key_length
+        return self.data[start + 4 : key_end], self.data[key_end : self.offsets[idx + 1]]
+
+    def get(self, key: Key) -> Optional[memoryview]:
+        key = encode_key(key)
+        digest = hash_key(key)
+        idx = bisect.bisect_left(self.hashes, digest)
+        # colliding hashes are adjacent, the stored key tells them apart
+        while idx < self.count and self.hashes[idx] == digest:
+            record_key, value = self.record(idx)
+            if record_key == key:
+                return value
+            idx += 1
+        return None
+
+    def __getitem__(self, key: Key) -> memoryview:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Key) -> bool:
+        return self.get(key) is not None
+
+    def items(self) -> Iterator[Tuple[memoryview, memoryview]]:
+        for idx in range(self.count):
+            yield self.record(idx)
@@ -0,0 +1,179 @@
+import collections
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Union
+
+from ..runtime.metrics import increment
+from . import get_storage_path
+
+DEFAULT_DIRECTORY = "/tmp/lambdaplatform-cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# seconds a copy is served without checking the source on NFS again
+DEFAULT_REVALIDATE_AFTER = 5.0
+# each process keeps its copies in a subdirectory of its own, the rest of the directory is left be
+PREFIX = "lambdaplatform-local-"
+
+_cache: Optional["LocalCache"] = None
+# called with the path of every removed copy, so holders of open mappings can let go of them
+_removal_callbacks: List[Callable[[pathlib.Path], None]] = []
+
+
+class Entry(NamedTuple):
+    path: pathlib.Path
+    size: int
+    mtime_ns: int
+    digest: str
+    validated_at: float
+
+
+class LocalCache:
+    # read-through copies of files on the EFS mount in the container's local /tmp, which outlives
+    # warm invocations but not the container, so the index can live in memory
+    def __init__(
+        self,
+        directory: Union[str, pathlib.Path] = DEFAULT_DIRECTORY,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        revalidate_after: float = DEFAULT_REVALIDATE_AFTER,
+    ):
+        self.directory = pathlib.Path(directory) / f"{PREFIX}{os.getpid()}"
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.entries: "collections.OrderedDict[pathlib.Path, Entry]" = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        # copies left behind by an earlier process are not in the index, start over
+        remove_stale(self.directory.parent)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get_path(
+        self, source: Union[str, pathlib.Path], *, digest: Optional[str] = None
+    ) -> pathlib.Path:
+        source = get_storage_path(source)
+        with self.lock:
+            entry = self.entries.get(source)
+            if entry is not None and self.is_fresh(source, entry, digest):
+                self.entries.move_to_end(source)
+                increment("LocalCacheHits")
+                return entry.path
+            increment("LocalCacheMisses")
+            if entry is not None:
+                self.remove(source)
+        # copied without the lock, hits on other files are not held up by a large one
+        entry = self.copy(source)
+        if entry is None:
+            return source
+        if digest is not None and entry.digest != digest:
+            with self.lock:
+                if self.entries.get(source) is entry:
+                    self.remove(source)
+            raise ValueError(f"{source} does not match the expected digest {digest}")
+        return entry.path
+
+    def open(self, source: Union[str, pathlib.Path], mode: str = "rb", **kwargs):
+        return open(self.get_path(source), mode, **kwargs)
+
+    def read_bytes(self, source: Union[str, pathlib.Path]) -> bytes:
+        return self.get_path(source).read_bytes()
+
+    def is_fresh(self, source: pathlib.Path, entry: Entry, digest: Optional[str]) -> bool:
+        # a known content hash validates the copy without touching NFS at all
+        if digest is not None:
+            return entry.digest == digest
+        if time.monotonic() - entry.validated_at < self.revalidate_after:
+            return True
+        try:
+            stat = source.stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size != entry.size or stat.st_mtime_ns != entry.mtime_ns:
+            return False
+        self.entries[source] = entry._replace(validated_at=time.monotonic())
+        return True
+
+    def copy(self, source: pathlib.Path) -> Optional[Entry]:
+        stat = source.stat()
+        if stat.st_size > self.max_bytes:
+            return None
+        sha256 = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with source.open("rb") as src, os.fdopen(fd, "wb") as dst:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    dst.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        path = self.directory / hashlib.sha256(str(source).encode("utf-8")).hexdigest()
+        entry = Entry(path, stat.st_size, stat.st_mtime_ns, sha256.hexdigest(), time.monotonic())
+        with self.lock:
+            # another thread may have copied it in the meantime, the later copy wins
+            if source in self.entries:
+                self.remove(source)
+            self.evict(self.max_bytes - entry.size)
+            os.replace(temp_path, path)
+            self.entries[source] = entry
+            self.size += entry.size
+        return entry
+
+    # evict and remove are called with the lock held
+    def evict(self, max_bytes: int):
+        while self.size > max_bytes and self.entries:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, source: pathlib.Path):
+        entry = self.entries.pop(source)
+        self.size -= entry.size
+        try:
+            entry.path.unlink()
+        except FileNotFoundError:
+            pass
+        # an unlinked file still takes up /tmp for as long as it is mapped
+        for callback in _removal_callbacks:
+            callback(entry.path)
+
+
+def remove_stale(directory: pathlib.Path):
+    # only subdirectories of processes that are gone, concurrent processes share the directory
+    for path in directory.glob(f"{PREFIX}*"):
+        try:
+            os.kill(int(path.name[len(PREFIX) :]), 0)
+        except ValueError:
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(path, ignore_errors=True)
+        except PermissionError:
+            pass
+
+
+def on_remove(callback: Callable[[pathlib.Path], None]):
+    _removal_callbacks.append(callback)
+
+
+def get_cache() -> LocalCache:
+    global _cache
+    if _cache is None:
+        _cache = LocalCache(
+            os.environ.get("LAMBDAPLATFORM_LOCAL_CACHE_PATH", DEFAULT_DIRECTORY),
+            max_bytes=int(os.environ.get("LAMBDAPLATFORM_LOCAL_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+            revalidate_after=float(
+                os.environ.get(
+                    "LAMBDAPLATFORM_LOCAL_CACHE_REVALIDATE_SECONDS", DEFAULT_REVALIDATE_AFTER
+                )
+            ),
+        )
+    return _cache
+
+
+def get_path(source: Union[str, pathlib.Path], *, digest: Optional[str] = None) -> pathlib.Path:
+    return get_cache().get_path(source, digest=digest)
@@ -0,0 +1,215 @@
+import functools
+import hashlib
+import json
+import pathlib
+import sqlite3
+import time
+from typing import Callable, Dict, Optional, Union
+
+from ..runtime import aio, background
+from ..runtime.context import accepts_context
+from ..runtime.metrics import increment
+from . import get_storage_path
+from .sqlite import Database, get_database
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICTION_BATCH = 64
+
+# the running total is kept by triggers so eviction never has to scan the table over NFS
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)",
+    "CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER)",
+    "INSERT OR IGNORE INTO usage VALUES (0, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+        UPDATE usage SET size = size + new.size;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+        UPDATE usage SET size = size - old.size + new.size;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+        UPDATE usage SET size = size - old.size;
+    END
+    """,
+)
+
+_caches: Dict[pathlib.Path, "ResultCache"] = {}
+_missing = object()
+
+
+def create_schema(connection: sqlite3.Connection):
+    for statement in SCHEMA:
+        connection.execute(statement)
+
+
+class ResultCache:
+    def __init__(self, path: Union[str, pathlib.Path], *, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = pathlib.Path(path)
+        self.max_bytes = max_bytes
+        self._database: Optional[Database] = None
+        self._evicting = False
+
+    @property
+    def database(self) -> Database:
+        if self._database is None:
+            database = get_database(self.path)
+            database.run_transaction(create_schema)
+            self._database = database
+        return self._database
+
+    def get(self, key: str) -> Optional[bytes]:
+        rows = self.database.read(
+            "SELECT value FROM results WHERE key = ? AND expires_at > ?", (key, time.time())
+        )
+        return rows[0][0] if rows else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        # batched with the other writes and committed once the response has been sent
+        self.database.write(
+            """
+            INSERT INTO results (key, value, size, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE
+            SET value = excluded.value, size = excluded.size, expires_at = excluded.expires_at
+            """,
+            (key, value, len(value), time.time() + ttl),
+        )
+        if not self._evicting:
+            # deferred after the batch's flush, once per batch
+            self._evicting = True
+            background.defer(self.evict)
+
+    def evict(self):
+        self._evicting = False
+        try:
+            # a plain read, the write lock is only taken when over the bound
+            if self.database.read("SELECT size FROM usage")[0][0] <= self.max_bytes:
+                return
+            self.database.run_transaction(self.remove_oldest)
+        except (sqlite3.Error, OSError):
+            log_failure("Memoization eviction failed")
+
+    def remove_oldest(self, connection: sqlite3.Connection):
+        connection.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        # with a shared TTL the entries closest to expiry are also the oldest ones
+        while self.get_size(connection) > self.max_bytes:
+            connection.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY expires_at LIMIT ?
+                )
+                """,
+                (EVICTION_BATCH,),
+            )
+
+    @staticmethod
+    def get_size(connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT size FROM usage").fetchone()[0]
+
+
+def get_cache(path: pathlib.Path, *, max_bytes: int) -> ResultCache:
+    # decorated handlers sharing a database share one bound, the tightest one asked for
+    if path not in _caches:
+        _caches[path] = ResultCache(path, max_bytes=max_bytes)
+    _caches[path].max_bytes = min(_caches[path].max_bytes, max_bytes)
+    return _caches[path]
+
+
+def log_failure(message: str):
+    import logging
+
+    logging.getLogger(__name__).warning(message, exc_info=True)
+    increment("MemoizeErrors")
+
+
+def get_key(namespace: str, event) -> str:
+    digest = hashlib.sha256(namespace.encode("utf-8") + b"\0")
+    if isinstance(event, (bytes, bytearray, memoryview)):
+        digest.update(event)
+    else:
+        digest.update(
+            json.dumps(event, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        )
+    return digest.hexdigest()
+
+
+def lookup(cache: ResultCache, key: str):
+    try:
+        value = cache.get(key)
+    except (sqlite3.Error, OSError):
+        # an unavailable cache (or mount) must never fail the invocation, the handler just runs
+        log_failure("Memoization lookup failed")
+        return _missing
+    if value is None:
+        increment("MemoizeMisses")
+        return _missing
+    increment("MemoizeHits")
+    return json.loads(value)
+
+
+def store(cache: ResultCache, key: str, result, ttl: float):
+    try:
+        value = json.dumps(result, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        # streams and other results the runtime encodes itself are not memoized
+        return
+    try:
+        cache.set(key, value, ttl)
+    except (sqlite3.Error, OSError):
+        log_failure("Memoization store failed")
+
+
+def memoize_handler(
+    *,
+    ttl: float = 300.0,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    path: Optional[Union[str, pathlib.Path]] = None,
+    namespace: Optional[str] = None,
+):
+    def decorator(handler: Callable) -> Callable:
+        cache = get_cache(
+            pathlib.Path(path or get_storage_path("lambdaplatform", "memoize.sqlite3")),
+            max_bytes=max_bytes,
+        )
+        name = namespace or f"{handler.__module__}.{handler.__qualname__}"
+        pass_context = accepts_context(handler)
+
+        def call(event, context):
+            return handler(event, context) if pass_context else handler(event)
+
+        if aio.is_async_callable(handler):
+
+            @functools.wraps(handler)
+            async def async_wrapper(event, context=None):
+                key = get_key(name, event)
+                result = lookup(cache, key)
+                if result is _missing:
+                    result = await call(event, context)
+                    store(cache, key, result, ttl)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(event, context=None):
+            key = get_key(name, event)
+            result = lookup(cache, key)
+            if result is _missing:
+                result = call(event, context)
+                store(cache, key, result, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,159 @@
+import atexit
+import contextlib
+import pathlib
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from ..runtime import background
+from ..runtime.metrics import increment
+
+T = TypeVar("T")
+
+# EFS is NFS: WAL needs shared memory between hosts, which NFS cannot provide, so databases use a
+# rollback journal guarded by POSIX byte range locks, which EFS does implement across clients.
+# A persistent journal is reused instead of being created and unlinked, both NFS round trips.
+PRAGMAS = (
+    "PRAGMA journal_mode=PERSIST",
+    "PRAGMA synchronous=FULL",
+    "PRAGMA mmap_size=0",
+)
+
+_databases: Dict[pathlib.Path, "Database"] = {}
+
+
+def connect(path: Union[str, pathlib.Path], *, timeout: float = 10.0) -> sqlite3.Connection:
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # autocommit, writers open their transactions with BEGIN IMMEDIATE themselves
+    connection = sqlite3.connect(
+        path, timeout=timeout, isolation_level=None, check_same_thread=False
+    )
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+@contextlib.contextmanager
+def transaction(connection: sqlite3.Connection):
+    # BEGIN IMMEDIATE takes the write lock up front, a deferred transaction upgrading its read lock
+    # fails with SQLITE_BUSY without ever calling the busy handler
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+        connection.execute("COMMIT")
+    except BaseException:
+        # a COMMIT that stays busy while readers hold their locks leaves the transaction open
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+
+
+def is_busy(ex: Exception) -> bool:
+    return isinstance(ex, sqlite3.OperationalError) and str(ex).startswith(
+        ("database is locked", "database is busy")
+    )
+
+
+class Database:
+    # one connection per container, reused across warm invocations
+    def __init__(
+        self,
+        path: Union[str, pathlib.Path],
+        *,
+        timeout: float = 1.0,
+        attempts: int = 8,
+        backoff: float = 0.01,
+        batch_size: int = 100,
+    ):
+        self.path = pathlib.Path(path)
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        self.pending: List[Tuple[str, Sequence]] = []
+        self._connection: Optional[sqlite3.Connection] = None
+        atexit.register(self.flush)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        with self.lock:
+            if self._connection is None:
+                self._connection = connect(self.path, timeout=self.timeout)
+            return self._connection
+
+    def retry(self, function: Callable[[], T]) -> T:
+        # sqlite's own busy handler only waits `timeout` per attempt, on top of that contended
+        # attempts back off with jitter so containers do not hammer the NFS lock in lockstep
+        attempt = 0
+        while True:
+            try:
+                return function()
+            except sqlite3.OperationalError as ex:
+                attempt += 1
+                if not is_busy(ex) or attempt >= self.attempts:
+                    raise
+            increment("SqliteBusyRetries")
+            time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def read(self, sql: str, parameters: Sequence = ()) -> List[tuple]:
+        # reads do not see writes still pending in the batch, flush() first where that matters
+        with self.lock:
+            return self.retry(lambda: self.connection.execute(sql, parameters).fetchall())
+
+    def run_transaction(self, function: Callable[[sqlite3.Connection], T]) -> T:
+        def attempt():
+            with transaction(self.connection) as connection:
+                return function(connection)
+
+        with self.lock:
+            return self.retry(attempt)
+
+    def write(self, sql: str, parameters: Sequence = ()):
+        with self.lock:
+            if not self.pending:
+                # committed once the response has been sent, one transaction for the whole batch
+                background.defer(self.flush)
+            self.pending.append((sql, parameters))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+            if not pending:
+                return
+
+            def execute(connection):
+                for sql, parameters in pending:
+                    connection.execute(sql, parameters)
+
+            try:
+                self.run_transaction(execute)
+            except BaseException:
+                self.pending[:0] = pending
+                # later writes see pending statements and do not defer a flush, so this one does
+                background.defer_retry(self.flush)
+                raise
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def get_database(path: Union[str, pathlib.Path], **kwargs) -> Database:
+    # one Database per path, callers asking for other settings than it was opened with are refused
+    path = pathlib.Path(path)
+    if path not in _databases:
+        _databases[path] = Database(path, **kwargs)
+    database = _databases[path]
+    for name, value in kwargs.items():
+        if getattr(database, name) != value:
+            raise ValueError(f"{path} is already open with {name}={getattr(database, name)!r}")
+    return database
@@ -0,0 +1,11 @@
+from ..runtime.dispatch import Dispatcher
+
+# one entry point for the platform's utility functions, each only imports the task it runs
+dispatch = Dispatcher(
+    {
+        "AvailabilityZones": f"{__name__}.availability_zones:handler",
+        "ImageTag": f"{__name__}.image_tagger:handler",
+        "ImageTagArm64": f"{__name__}.image_tagger:handler",
+        "aws.ec2": f"{__name__}.lambda_eip_allocator:handler",
+    }
+)
@@ -1,5 +1,4 @@
-import boto3
-
+from .. import clients
 from . import common
 
 
@@ -11,7 +10,7 @@ def handler(event):
                 previous_zone_names = event["PhysicalResourceId"].split(",")
             current_zone_names = sorted(
                 zone["ZoneName"]
-                for zone in boto3.client("ec2").describe_availability_zones(
+                for zone in clients.client("ec2").describe_availability_zones(
                     Filters=[
                         {
                             "Name": "zone-type",
@@ -1,12 +1,11 @@
-import boto3
-
+from .. import clients
 from . import common
 
 
 def handler(event):
     with common.cloudformation_custom_resource(event) as resource:
         if event["RequestType"] in {"Create", "Update"}:
-            ecr = boto3.client("ecr")
+            ecr = clients.client("ecr")
             response = ecr.batch_get_image(
                 repositoryName=event["ResourceProperties"]["RepositoryName"],
                 imageIds=[
@@ -1,8 +1,8 @@
-import boto3
+from .. import clients
 
 
 def handler(event):
-    ec2 = boto3.client("ec2")
+    ec2 = clients.client("ec2")
 
     if event["detail"]["eventName"] == "CreateNetworkInterface":
         interface_id = event["detail"]["responseElements"]["networkInterface"]["networkInterfaceId"]
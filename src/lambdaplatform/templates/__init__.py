@@ -1,7 +1,9 @@
 import argparse
+import collections
 import itertools
 import json
 import pathlib
+from typing import Dict, Optional, Sequence
 
 from troposphere import (
     AccountId,
@@ -43,7 +45,24 @@ from . import (
 )
 
 
-def create_primary_template():
+def create_primary_template(
+    *,
+    memory_sizes: Optional[Dict[str, int]] = None,
+    ephemeral_storage_size: int = common.DEFAULT_EPHEMERAL_STORAGE_SIZE,
+    warming: Optional[Dict[str, common.Warming]] = None,
+    architectures: Optional[Dict[str, str]] = None,
+    memory_tiers: Sequence[common.MemoryTier] = (),
+    event_sources: Sequence[common.EventSource] = (),
+    deferred_execution: bool = False,
+):
+    memory_sizes = memory_sizes or {}
+    warming = warming or {}
+    architectures = collections.defaultdict(
+        lambda: common.DEFAULT_ARCHITECTURE, architectures or {}
+    )
+    for key, architecture in architectures.items():
+        if architecture not in common.ARCHITECTURES:
+            raise ValueError(f"Unsupported architecture {architecture!r} for {key}")
     template = Template(Description="Root stack for VERY STRONG Lambda function")
 
     image_digest = template.add_parameter(Parameter("ImageDigest", Type="String", Default=""))
@@ -51,6 +70,11 @@ def create_primary_template():
     is_image_digest_defined = "IsImageDigestDefined"
     template.add_condition(is_image_digest_defined, Not(Equals(Ref(image_digest), "")))
 
+    # functions running on arm64 need the deploy tool to push that image too
+    image_digest_arm64 = template.add_parameter(
+        Parameter("ImageDigestArm64", Type="String", Default="")
+    )
+
     artifact_repository = template.add_resource(
         Repository(
             "ArtifactRepository",
@@ -96,7 +120,10 @@ def create_primary_template():
             Ref(artifact_repository),
         ],
     )
-    image_uri = Join("@", [artifact_repository_url, Ref(image_digest)])
+    image_uris = {
+        "x86_64": Join("@", [artifact_repository_url, Ref(image_digest)]),
+        "arm64": Join("@", [artifact_repository_url, Ref(image_digest_arm64)]),
+    }
 
     artifact_bucket = template.add_resource(
         Bucket(
@@ -150,11 +177,16 @@ def create_primary_template():
         Stack(
             "AvailabilityZones",
             TemplateURL=common.get_template_s3_url(
-                Ref(artifact_bucket), availability_zones.create_template()
+                Ref(artifact_bucket),
+                availability_zones.create_template(
+                    memory_size=memory_sizes.get("AvailabilityZones", common.DEFAULT_MEMORY_SIZE),
+                    warming=warming.get("AvailabilityZones", common.Warming()),
+                    architecture=architectures["AvailabilityZones"],
+                ),
             ),
             Parameters={
                 "DeploymentId": GetAtt(deployment_id_stack, "Outputs.Value"),
-                "ImageUri": image_uri,
+                "ImageUri": image_uris[architectures["AvailabilityZones"]],
             },
             Condition=is_image_digest_defined,
         )
@@ -175,12 +207,17 @@ def create_primary_template():
         Stack(
             "LambdaEipAllocator",
             TemplateURL=common.get_template_s3_url(
-                Ref(artifact_bucket), lambda_eip_allocator.create_template()
+                Ref(artifact_bucket),
+                lambda_eip_allocator.create_template(
+                    memory_size=memory_sizes.get("LambdaEipAllocator", common.DEFAULT_MEMORY_SIZE),
+                    warming=warming.get("LambdaEipAllocator", common.Warming()),
+                    architecture=architectures["LambdaEipAllocator"],
+                ),
             ),
             Parameters={
                 "DeploymentId": GetAtt(deployment_id_stack, "Outputs.Value"),
                 "VpcId": GetAtt(vpc_stack, "Outputs.VpcId"),
-                "ImageUri": image_uri,
+                "ImageUri": image_uris[architectures["LambdaEipAllocator"]],
             },
             Condition=is_image_digest_defined,
         )
@@ -205,7 +242,16 @@ def create_primary_template():
         Stack(
             "LambdaFunction",
             TemplateURL=common.get_template_s3_url(
-                Ref(artifact_bucket), lambda_function.create_template()
+                Ref(artifact_bucket),
+                lambda_function.create_template(
+                    memory_size=memory_sizes.get("LambdaFunction", common.DEFAULT_MEMORY_SIZE),
+                    ephemeral_storage_size=ephemeral_storage_size,
+                    warming=warming.get("LambdaFunction", common.Warming()),
+                    architecture=architectures["LambdaFunction"],
+                    memory_tiers=memory_tiers,
+                    event_sources=event_sources,
+                    deferred_execution=deferred_execution,
+                ),
             ),
             Parameters={
                 "DeploymentId": GetAtt(deployment_id_stack, "Outputs.Value"),
@@ -214,7 +260,7 @@ def create_primary_template():
                 "FileSystemAccessPointArn": GetAtt(
                     elastic_file_system_stack, "Outputs.AccessPointArn"
                 ),
-                "ImageUri": image_uri,
+                "ImageUri": image_uris[architectures["LambdaFunction"]],
             },
             DependsOn=[lambda_eip_allocator_stack],
             Condition=is_image_digest_defined,
@@ -225,14 +271,20 @@ def create_primary_template():
         Stack(
             "ImageTagger",
             TemplateURL=common.get_template_s3_url(
-                Ref(artifact_bucket), image_tagger.create_template()
+                Ref(artifact_bucket),
+                image_tagger.create_template(
+                    memory_size=memory_sizes.get("ImageTagger", common.DEFAULT_MEMORY_SIZE),
+                    warming=warming.get("ImageTagger", common.Warming()),
+                    architecture=architectures["ImageTagger"],
+                ),
             ),
             Parameters={
                 "DeploymentId": GetAtt(deployment_id_stack, "Outputs.Value"),
                 "ArtifactRepository": Ref(artifact_repository),
                 "DesiredImageTag": "current-cloudformation",
                 "ImageDigest": Ref(image_digest),
-                "ImageUri": image_uri,
+                "ImageDigestArm64": Ref(image_digest_arm64),
+                "ImageUri": image_uris[architectures["ImageTagger"]],
             },
             DependsOn=list(template.resources),
             Condition=is_image_digest_defined,
@@ -253,19 +305,90 @@ def create_primary_template():
         )
     )
 
+    if memory_tiers:
+        template.add_output(
+            Output(
+                "MemoryTiers",
+                Value=GetAtt(lambda_function_stack, "Outputs.MemoryTiers"),
+                Condition=is_image_digest_defined,
+            )
+        )
+
     return template
 
 
 def get_args(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("--output-dir", type=pathlib.Path, default=pathlib.Path(".") / "templates")
+    parser.add_argument(
+        "--memory-sizes",
+        type=pathlib.Path,
+        help="JSON object of MemorySize per nested stack, as written by lambdaplatform-tune-memory",
+    )
+    parser.add_argument(
+        "--ephemeral-storage-size",
+        type=int,
+        default=common.DEFAULT_EPHEMERAL_STORAGE_SIZE,
+        help="MB of /tmp for the user function, half of it backs the local EFS read cache",
+    )
+    parser.add_argument(
+        "--warming",
+        type=pathlib.Path,
+        help="JSON object of provisioned concurrency, scaling windows and warmed containers per "
+        "nested stack",
+    )
+    parser.add_argument(
+        "--architectures",
+        type=pathlib.Path,
+        help="JSON object of x86_64 or arm64 per nested stack, as written by "
+        "lambdaplatform-tune-memory",
+    )
+    parser.add_argument(
+        "--memory-tiers",
+        type=pathlib.Path,
+        help="JSON list of name, memory_size and min_payload_bytes of additional MemorySize "
+        "variants of the user function, invocations are routed between them",
+    )
+    parser.add_argument(
+        "--event-sources",
+        type=pathlib.Path,
+        help="JSON list of SQS, Kinesis or DynamoDB stream event sources of the user function, "
+        "with kind, arn and optionally batch_size, maximum_batching_window, starting_position and "
+        "filters",
+    )
+    parser.add_argument(
+        "--deferred-execution",
+        action="store_true",
+        help="Add the queue, table and mappings lambdaplatform.deferred needs to the user function",
+    )
     return parser.parse_args(argv)
 
 
 def main():
     args = get_args()
     args.output_dir.mkdir(parents=True, exist_ok=True)
-    primary_template = create_primary_template()
+    memory_sizes = json.loads(args.memory_sizes.read_text()) if args.memory_sizes else {}
+    warming = {
+        name: common.Warming.from_json(value)
+        for name, value in (json.loads(args.warming.read_text()) if args.warming else {}).items()
+    }
+    primary_template = create_primary_template(
+        memory_sizes=memory_sizes,
+        ephemeral_storage_size=args.ephemeral_storage_size,
+        warming=warming,
+        architectures=json.loads(args.architectures.read_text()) if args.architectures else {},
+        memory_tiers=[
+            common.MemoryTier(**tier)
+            for tier in (json.loads(args.memory_tiers.read_text()) if args.memory_tiers else [])
+        ],
+        event_sources=[
+            common.EventSource(**event_source)
+            for event_source in (
+                json.loads(args.event_sources.read_text()) if args.event_sources else []
+            )
+        ],
+        deferred_execution=args.deferred_execution,
+    )
     all_templates = itertools.chain(
         [
             (
@@ -3,16 +3,21 @@ import inspect
 from awacs import ec2, logs, sts
 from awacs.aws import Allow, PolicyDocument, Principal, Statement
 from troposphere import Equals, FindInMap, GetAtt, Join, Output, Parameter, Ref, Split, Template
-from troposphere.awslambda import Code, Function, ImageConfig
+from troposphere.awslambda import Code, ImageConfig
 from troposphere.cloudformation import CustomResource
 from troposphere.iam import PolicyType, Role
 from troposphere.logs import LogGroup
 
-from ..tasks.availability_zones import handler
+from .. import tasks
 from . import common
 
 
-def create_template():
+def create_template(
+    *,
+    memory_size: int = common.DEFAULT_MEMORY_SIZE,
+    warming: common.Warming = common.Warming(),
+    architecture: str = common.DEFAULT_ARCHITECTURE,
+):
     template = Template(Description="Stable availability zone discovery utility")
 
     deployment_id = template.add_parameter(
@@ -48,9 +53,10 @@ def create_template():
     function, alias = common.add_versioned_lambda(
         template,
         Ref(deployment_id),
-        Function(
+        common.Function(
             "Function",
-            MemorySize=256,
+            MemorySize=memory_size,
+            Architectures=[architecture],
             Timeout=30,
             Role=GetAtt(role, "Arn"),
             PackageType="Image",
@@ -59,12 +65,14 @@ def create_template():
             ),
             ImageConfig=ImageConfig(
                 Command=[
-                    Join(":", (handler.__module__, handler.__name__)),
+                    Join(":", (tasks.__name__, "dispatch")),
                 ],
             ),
         ),
     )
 
+    common.add_warming(template, function, alias, role, warming)
+
     log_group = template.add_resource(
         LogGroup(
             "LogGroup",
@@ -1,8 +1,30 @@
 import functools
 import hashlib
+import json
+from typing import Any, NamedTuple, Optional, Sequence
 
-from troposphere import Equals, GetAtt, If, Join, Not, Ref, Select, Split
-from troposphere.awslambda import Alias, Environment, Version
+from awacs import awslambda as lambda_actions
+from awacs import dynamodb, kinesis, sqs
+from awacs.aws import Allow, PolicyDocument, Statement
+from troposphere import AccountId, AWSProperty, Equals, GetAtt, If, Join, Not, Partition, Ref
+from troposphere import Select, Split, StackName
+from troposphere import awslambda
+from troposphere.applicationautoscaling import (
+    ScalableTarget,
+    ScalableTargetAction,
+    ScheduledAction,
+)
+from troposphere.awslambda import (
+    Alias,
+    Environment,
+    Permission,
+    ProvisionedConcurrencyConfiguration,
+    Version,
+)
+from troposphere.events import Rule, Target
+from troposphere.iam import PolicyType
+
+from .. import warmer
 
 template_registry = {}
 
@@ -90,4 +112,250 @@ def determine_parity(s):
     return Select(1, Split("[1]", Join("", [s, "ODD[1]EVEN"])))
 
 
+class EphemeralStorage(AWSProperty):
+    props = {
+        "Size": (int, True),
+    }
+
+
+class Function(awslambda.Function):
+    # the pinned troposphere predates these Function properties
+    props = {
+        **awslambda.Function.props,
+        "EphemeralStorage": (EphemeralStorage, False),
+        "Architectures": ([str], False),
+    }
+
+
+class Filter(AWSProperty):
+    props = {
+        "Pattern": (str, False),
+    }
+
+
+class FilterCriteria(AWSProperty):
+    props = {
+        "Filters": ([Filter], False),
+    }
+
+
+class EventSourceMapping(awslambda.EventSourceMapping):
+    # the pinned troposphere predates event filtering
+    props = {
+        **awslambda.EventSourceMapping.props,
+        "FilterCriteria": (FilterCriteria, False),
+    }
+
+
+class EventSource(NamedTuple):
+    kind: str  # "sqs", "kinesis" or "dynamodb"
+    arn: Any
+    batch_size: int = 10
+    maximum_batching_window: int = 0
+    starting_position: str = "LATEST"
+    filters: Sequence[dict] = ()  # event patterns, records matching none never invoke the function
+
+
+EVENT_SOURCE_ACTIONS = {
+    "sqs": [sqs.ReceiveMessage, sqs.DeleteMessage, sqs.GetQueueAttributes],
+    "kinesis": [
+        kinesis.DescribeStream,
+        kinesis.DescribeStreamSummary,
+        kinesis.GetRecords,
+        kinesis.GetShardIterator,
+        kinesis.ListShards,
+        kinesis.ListStreams,
+    ],
+    "dynamodb": [
+        dynamodb.DescribeStream,
+        dynamodb.GetRecords,
+        dynamodb.GetShardIterator,
+        dynamodb.ListStreams,
+    ],
+}
+
+
+def add_event_source_mapping(template, title, alias, role, event_source):
+    if event_source.kind not in EVENT_SOURCE_ACTIONS:
+        raise ValueError(f"Unsupported event source kind {event_source.kind!r}")
+    if event_source.kind == "sqs" and event_source.batch_size > 10:
+        # SQS rejects batches above 10 messages unless a batching window is configured
+        if event_source.maximum_batching_window < 1:
+            raise ValueError("SQS batch sizes above 10 need a maximum batching window")
+
+    policy = template.add_resource(
+        PolicyType(
+            f"{title}Policy",
+            PolicyName=Join("-", [StackName, title]),
+            PolicyDocument=PolicyDocument(
+                Version="2012-10-17",
+                Statement=[
+                    Statement(
+                        Effect=Allow,
+                        Resource=[event_source.arn],
+                        Action=EVENT_SOURCE_ACTIONS[event_source.kind],
+                    ),
+                ],
+            ),
+            Roles=[Ref(role)],
+        )
+    )
+
+    mapping = EventSourceMapping(
+        title,
+        EventSourceArn=event_source.arn,
+        FunctionName=Ref(alias),
+        BatchSize=event_source.batch_size,
+        MaximumBatchingWindowInSeconds=event_source.maximum_batching_window,
+        FunctionResponseTypes=["ReportBatchItemFailures"],
+        DependsOn=[policy],
+    )
+    if event_source.kind != "sqs":
+        mapping.StartingPosition = event_source.starting_position
+    if event_source.filters:
+        mapping.FilterCriteria = FilterCriteria(
+            Filters=[Filter(Pattern=json.dumps(pattern)) for pattern in event_source.filters]
+        )
+
+    return template.add_resource(mapping)
+
+
+class ScalingWindow(NamedTuple):
+    # Application Auto Scaling schedule expressions in UTC, e.g. "cron(0 8 ? * MON-FRI *)"
+    start: str
+    end: str
+    provisioned_concurrency: int
+
+
+class Warming(NamedTuple):
+    provisioned_concurrency: int = 0
+    scaling_windows: Sequence[ScalingWindow] = ()
+    # kept warm by scheduled concurrent pings instead, billed per ping rather than per hour
+    containers: int = 0
+    schedule: str = "rate(5 minutes)"
+
+    @classmethod
+    def from_json(cls, value: dict) -> "Warming":
+        windows = [ScalingWindow(**window) for window in value.get("scaling_windows", ())]
+        return cls(**{**value, "scaling_windows": windows})
+
+
+class MemoryTier(NamedTuple):
+    # a variant of the function at another MemorySize, sharing its image, role and mounts
+    name: str
+    memory_size: int
+    # payloads of at least this many bytes are routed to the tier, without one only hints are
+    min_payload_bytes: Optional[int] = None
+
+
+def add_warming(template, function, alias, role, warming):
+    if warming.scaling_windows:
+        # the scheduled actions own the alias' provisioned concurrency from here on, setting it on
+        # the alias as well would reset it to the base level on every deployment
+        levels = [window.provisioned_concurrency for window in warming.scaling_windows]
+        actions = []
+        for idx, window in enumerate(warming.scaling_windows):
+            for phase, schedule, level in (
+                ("start", window.start, window.provisioned_concurrency),
+                ("end", window.end, warming.provisioned_concurrency),
+            ):
+                actions.append(
+                    ScheduledAction(
+                        ScheduledActionName=f"window{idx}-{phase}",
+                        Schedule=schedule,
+                        ScalableTargetAction=ScalableTargetAction(
+                            MinCapacity=level,
+                            MaxCapacity=level,
+                        ),
+                    )
+                )
+        template.add_resource(
+            ScalableTarget(
+                f"{function.title}ScalableTarget",
+                ServiceNamespace="lambda",
+                ScalableDimension="lambda:function:ProvisionedConcurrency",
+                ResourceId=Join(":", ["function", Ref(function), alias.Name]),
+                MinCapacity=warming.provisioned_concurrency,
+                MaxCapacity=max([warming.provisioned_concurrency, *levels]),
+                RoleARN=Join(
+                    "",
+                    [
+                        "arn:",
+                        Partition,
+                        ":iam::",
+                        AccountId,
+                        ":role/aws-service-role/lambda.application-autoscaling.amazonaws.com/",
+                        "AWSServiceRoleForApplicationAutoScaling_LambdaConcurrency",
+                    ],
+                ),
+                ScheduledActions=actions,
+                DependsOn=[alias],
+            )
+        )
+    elif warming.provisioned_concurrency:
+        alias.ProvisionedConcurrencyConfig = ProvisionedConcurrencyConfiguration(
+            ProvisionedConcurrentExecutions=warming.provisioned_concurrency,
+        )
+
+    if not warming.containers:
+        return
+    if warming.containers > warmer.MAX_CONTAINERS:
+        raise ValueError(f"At most {warmer.MAX_CONTAINERS} containers can be kept warm by pings")
+    function.Environment.Variables[warmer.CONTAINERS] = str(warming.containers)
+
+    rule = template.add_resource(
+        Rule(
+            f"{function.title}Warmer",
+            ScheduleExpression=warming.schedule,
+            Targets=[
+                Target(
+                    Id="warmer",
+                    Arn=Ref(alias),
+                    Input=json.dumps(warmer.get_event(warming.containers)),
+                ),
+            ],
+        )
+    )
+
+    template.add_resource(
+        Permission(
+            f"{function.title}WarmerPermission",
+            Principal="events.amazonaws.com",
+            Action="lambda:InvokeFunction",
+            FunctionName=Ref(alias),
+            SourceArn=GetAtt(rule, "Arn"),
+        )
+    )
+
+    if warming.containers > 1:
+        # the pinged container fans out the remaining pings to its own alias
+        template.add_resource(
+            PolicyType(
+                f"{function.title}WarmerPolicy",
+                PolicyName=Join("-", [StackName, f"{function.title}Warmer"]),
+                PolicyDocument=PolicyDocument(
+                    Version="2012-10-17",
+                    Statement=[
+                        Statement(
+                            Effect=Allow,
+                            Resource=[Ref(alias)],
+                            Action=[lambda_actions.InvokeFunction],
+                        ),
+                    ],
+                ),
+                Roles=[Ref(role)],
+            )
+        )
+
+
 LOG_RETENTION_DAYS = 7
+
+# see lambdaplatform.tuning for measuring the right size per function
+DEFAULT_MEMORY_SIZE = 256
+
+# MB of /tmp, the storage.local read-through cache may use half of it
+DEFAULT_EPHEMERAL_STORAGE_SIZE = 512
+
+# Lambda names, each architecture runs its own image, see the ImageDigest parameters
+ARCHITECTURES = ("x86_64", "arm64")
+DEFAULT_ARCHITECTURE = "x86_64"
@@ -2,17 +2,33 @@ import inspect
 
 from awacs import ecr, logs, sts
 from awacs.aws import Allow, PolicyDocument, Principal, Statement
-from troposphere import Equals, FindInMap, GetAtt, Join, Output, Parameter, Ref, Split, Template
-from troposphere.awslambda import Code, Function, ImageConfig
+from troposphere import (
+    Equals,
+    FindInMap,
+    GetAtt,
+    Join,
+    Not,
+    Output,
+    Parameter,
+    Ref,
+    Split,
+    Template,
+)
+from troposphere.awslambda import Code, ImageConfig
 from troposphere.cloudformation import CustomResource
 from troposphere.iam import PolicyType, Role
 from troposphere.logs import LogGroup
 
-from ..tasks.image_tagger import handler
+from .. import tasks
 from . import common
 
 
-def create_template():
+def create_template(
+    *,
+    memory_size: int = common.DEFAULT_MEMORY_SIZE,
+    warming: common.Warming = common.Warming(),
+    architecture: str = common.DEFAULT_ARCHITECTURE,
+):
     template = Template(Description="ECR image tagger utility")
 
     deployment_id = template.add_parameter(
@@ -36,6 +52,17 @@ def create_template():
         )
     )
 
+    image_digest_arm64 = template.add_parameter(
+        Parameter(
+            "ImageDigestArm64",
+            Type="String",
+            Default="",
+        )
+    )
+
+    is_image_digest_arm64_defined = "IsImageDigestArm64Defined"
+    template.add_condition(is_image_digest_arm64_defined, Not(Equals(Ref(image_digest_arm64), "")))
+
     desired_image_tag = template.add_parameter(
         Parameter(
             "DesiredImageTag",
@@ -69,9 +96,10 @@ def create_template():
     function, alias = common.add_versioned_lambda(
         template,
         Ref(deployment_id),
-        Function(
+        common.Function(
             "Function",
-            MemorySize=256,
+            MemorySize=memory_size,
+            Architectures=[architecture],
             Timeout=30,
             Role=GetAtt(role, "Arn"),
             PackageType="Image",
@@ -80,12 +108,14 @@ def create_template():
             ),
             ImageConfig=ImageConfig(
                 Command=[
-                    Join(":", (handler.__module__, handler.__name__)),
+                    Join(":", (tasks.__name__, "dispatch")),
                 ],
             ),
         ),
     )
 
+    common.add_warming(template, function, alias, role, warming)
+
     log_group = template.add_resource(
         LogGroup(
             "LogGroup",
@@ -130,4 +160,18 @@ def create_template():
         )
     )
 
+    # the arm64 image is pushed separately, untagged it would be expired like any other
+    template.add_resource(
+        CustomResource(
+            "ImageTagArm64",
+            ServiceToken=Ref(alias),
+            DeploymentId=Ref(deployment_id),
+            RepositoryName=Ref(artifact_repository),
+            ImageDigest=Ref(image_digest_arm64),
+            ImageTag=Join("-", [Ref(desired_image_tag), "arm64"]),
+            DependsOn=[policy],
+            Condition=is_image_digest_arm64_defined,
+        )
+    )
+
     return template
@@ -16,16 +16,21 @@ from troposphere import (
     Split,
     Template,
 )
-from troposphere.awslambda import Code, Function, ImageConfig, Permission
+from troposphere.awslambda import Code, ImageConfig, Permission
 from troposphere.events import Rule, Target
 from troposphere.iam import PolicyType, Role
 from troposphere.logs import LogGroup
 
-from ..tasks.lambda_eip_allocator import handler
+from .. import tasks
 from . import common
 
 
-def create_template():
+def create_template(
+    *,
+    memory_size: int = common.DEFAULT_MEMORY_SIZE,
+    warming: common.Warming = common.Warming(),
+    architecture: str = common.DEFAULT_ARCHITECTURE,
+):
     template = Template(Description="Lambda VPC interface IP allocator utility")
 
     vpc_id = template.add_parameter(Parameter("VpcId", Type="String"))
@@ -63,9 +68,10 @@ def create_template():
     function, alias = common.add_versioned_lambda(
         template,
         Ref(deployment_id),
-        Function(
+        common.Function(
             "Function",
-            MemorySize=256,
+            MemorySize=memory_size,
+            Architectures=[architecture],
             Timeout=30,
             Role=GetAtt(role, "Arn"),
             PackageType="Image",
@@ -74,12 +80,14 @@ def create_template():
             ),
             ImageConfig=ImageConfig(
                 Command=[
-                    Join(":", (handler.__module__, handler.__name__)),
+                    Join(":", (tasks.__name__, "dispatch")),
                 ],
             ),
         ),
     )
 
+    common.add_warming(template, function, alias, role, warming)
+
     log_group = template.add_resource(
         LogGroup(
             "FunctionLogs",
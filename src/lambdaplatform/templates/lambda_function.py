@@ -1,6 +1,8 @@
 import inspect
+import json
+from typing import Sequence
 
-from awacs import ec2, logs, sts
+from awacs import awslambda, dynamodb, ec2, logs, sqs, sts
 from awacs.aws import Allow, PolicyDocument, Principal, Statement
 from troposphere import (
     Condition,
@@ -19,20 +21,160 @@ from troposphere.awslambda import (
     Code,
     Environment,
     FileSystemConfig,
-    Function,
     ImageConfig,
     Version,
     VPCConfig,
 )
+from troposphere.dynamodb import (
+    AttributeDefinition,
+    KeySchema,
+    StreamSpecification,
+    Table,
+    TimeToLiveSpecification,
+)
 from troposphere.ec2 import SecurityGroup
 from troposphere.iam import Policy, PolicyType, Role
 from troposphere.logs import LogGroup
+from troposphere.sqs import Queue, RedrivePolicy
 
+from .. import deferred, storage, tiers, tuning
 from ..tasks.lambda_function import handler
 from . import common
 
+# the main function's own tier, it runs whatever no other tier is selected for
+DEFAULT_TIER = "default"
+
+
+def join_tiers(entries):
+    # JSON for tiers.Router, the aliases' ARNs are only known once CloudFormation created them
+    items = []
+    for name, memory_size, min_payload_bytes, arn in entries:
+        prefix = json.dumps(
+            {"name": name, "memory_size": memory_size, "min_payload_bytes": min_payload_bytes}
+        )[:-1]
+        items.append(
+            prefix + ', "arn": null}'
+            if arn is None
+            else Join("", [prefix, ', "arn": "', arn, '"}'])
+        )
+    return Join("", ["[", Join(",", items), "]"])
+
+
+def add_deferred_resources(template):
+    deferred_dead_letter_queue = template.add_resource(
+        Queue(
+            "DeferredDeadLetterQueue",
+            MessageRetentionPeriod=14 * 24 * 60 * 60,
+        )
+    )
+
+    deferred_queue = template.add_resource(
+        Queue(
+            "DeferredQueue",
+            RedrivePolicy=RedrivePolicy(
+                deadLetterTargetArn=GetAtt(deferred_dead_letter_queue, "Arn"),
+                maxReceiveCount=5,
+            ),
+        )
+    )
+
+    deferred_table = template.add_resource(
+        Table(
+            "DeferredTable",
+            AttributeDefinitions=[AttributeDefinition(AttributeName="key", AttributeType="S")],
+            KeySchema=[KeySchema(AttributeName="key", KeyType="HASH")],
+            BillingMode="PAY_PER_REQUEST",
+            TimeToLiveSpecification=TimeToLiveSpecification(
+                AttributeName="expires_at",
+                Enabled=True,
+            ),
+            StreamSpecification=StreamSpecification(StreamViewType="OLD_IMAGE"),
+        )
+    )
+
+    return deferred_queue, deferred_table
+
+
+def add_deferred_execution(template, alias, role, deferred_queue, deferred_table):
+    template.add_resource(
+        PolicyType(
+            "DeferredPolicy",
+            PolicyName="deferred",
+            PolicyDocument=PolicyDocument(
+                Version="2012-10-17",
+                Statement=[
+                    Statement(
+                        Effect=Allow,
+                        Resource=[GetAtt(deferred_queue, "Arn")],
+                        Action=[sqs.SendMessage],
+                    ),
+                    Statement(
+                        Effect=Allow,
+                        Resource=[GetAtt(deferred_table, "Arn")],
+                        Action=[dynamodb.PutItem, dynamodb.DeleteItem],
+                    ),
+                ],
+            ),
+            Roles=[Ref(role)],
+        )
+    )
+
+    common.add_event_source_mapping(
+        template,
+        "DeferredQueueMapping",
+        alias,
+        role,
+        common.EventSource("sqs", GetAtt(deferred_queue, "Arn"), maximum_batching_window=1),
+    )
+
+    # only deletions by TTL release work, the function's own writes never invoke it
+    common.add_event_source_mapping(
+        template,
+        "DeferredTableMapping",
+        alias,
+        role,
+        common.EventSource(
+            "dynamodb",
+            GetAtt(deferred_table, "StreamArn"),
+            filters=[
+                {
+                    "eventName": ["REMOVE"],
+                    "userIdentity": {
+                        "type": ["Service"],
+                        "principalId": ["dynamodb.amazonaws.com"],
+                    },
+                }
+            ],
+        ),
+    )
+
 
-def create_template():
+def create_template(
+    *,
+    event_sources: Sequence[common.EventSource] = (),
+    memory_size: int = common.DEFAULT_MEMORY_SIZE,
+    ephemeral_storage_size: int = common.DEFAULT_EPHEMERAL_STORAGE_SIZE,
+    warming: common.Warming = common.Warming(),
+    architecture: str = common.DEFAULT_ARCHITECTURE,
+    memory_tiers: Sequence[common.MemoryTier] = (),
+    deferred_execution: bool = False,
+):
+    titles = set()
+    for tier in memory_tiers:
+        # names become part of logical ids, which only take ASCII letters and digits
+        if not (tier.name.isascii() and tier.name.isalnum()) or tier.name == DEFAULT_TIER:
+            raise ValueError(f"Invalid memory tier name {tier.name!r}")
+        if tier.name.title() in titles:
+            raise ValueError(f"Duplicate memory tier name {tier.name!r}, names ignore case")
+        titles.add(tier.name.title())
+        if tier.memory_size % tuning.MEMORY_INCREMENT or not (
+            tuning.MEMORY_SIZES[0] <= tier.memory_size <= tuning.MEMORY_SIZES[-1]
+        ):
+            raise ValueError(
+                f"Invalid memory size {tier.memory_size} of memory tier {tier.name!r}, use a "
+                f"multiple of {tuning.MEMORY_INCREMENT} MB from {tuning.MEMORY_SIZES[0]} to "
+                f"{tuning.MEMORY_SIZES[-1]}"
+            )
     template = Template(Description="User-defined code")
 
     deployment_id = template.add_parameter(
@@ -78,6 +220,9 @@ def create_template():
         )
     )
 
+    if deferred_execution:
+        deferred_queue, deferred_table = add_deferred_resources(template)
+
     role = template.add_resource(
         Role(
             "Role",
@@ -115,42 +260,93 @@ def create_template():
         )
     )
 
+    variables = {
+        "LAMBDAPLATFORM_LOCAL_CACHE_BYTES": str(ephemeral_storage_size * 1024 * 1024 // 2),
+    }
+    if deferred_execution:
+        variables.update(
+            {
+                deferred.QUEUE_URL: Ref(deferred_queue),
+                deferred.QUEUE_ARN: GetAtt(deferred_queue, "Arn"),
+                deferred.TABLE: Ref(deferred_table),
+            }
+        )
+    function_properties = dict(
+        Architectures=[architecture],
+        EphemeralStorage=common.EphemeralStorage(Size=ephemeral_storage_size),
+        Role=GetAtt(role, "Arn"),
+        VpcConfig=VPCConfig(
+            SecurityGroupIds=[Ref(security_group)],
+            SubnetIds=Ref(subnet_ids),
+        ),
+        FileSystemConfigs=[
+            FileSystemConfig(
+                Arn=Ref(file_system_access_point_arn),
+                LocalMountPath=storage.MOUNT_PATH,
+            ),
+        ],
+        PackageType="Image",
+        Code=Code(
+            ImageUri=Ref(image_uri),
+        ),
+        ImageConfig=ImageConfig(
+            Command=[
+                Join(":", (handler.__module__, handler.__name__)),
+            ],
+        ),
+    )
+
+    # the tiers run what they are sent, only the main function routes
+    tier_functions = []
+    tier_entries = []
+    for tier in memory_tiers:
+        tier_function, tier_alias = common.add_versioned_lambda(
+            template,
+            Ref(deployment_id),
+            common.Function(
+                f"FunctionTier{tier.name.title()}",
+                MemorySize=tier.memory_size,
+                Environment=Environment(Variables=dict(variables)),
+                **function_properties,
+            ),
+        )
+        tier_functions.append((tier_function, tier_alias))
+        tier_entries.append((tier.name, tier.memory_size, tier.min_payload_bytes, Ref(tier_alias)))
+    if memory_tiers:
+        variables[tiers.TIERS] = join_tiers([(DEFAULT_TIER, memory_size, 0, None)] + tier_entries)
+
     function, alias = common.add_versioned_lambda(
         template,
         Ref(deployment_id),
-        Function(
+        common.Function(
             "Function",
-            MemorySize=256,
-            Role=GetAtt(role, "Arn"),
-            VpcConfig=VPCConfig(
-                SecurityGroupIds=[Ref(security_group)],
-                SubnetIds=Ref(subnet_ids),
-            ),
-            FileSystemConfigs=[
-                FileSystemConfig(
-                    Arn=Ref(file_system_access_point_arn),
-                    LocalMountPath="/mnt/storage",
-                ),
-            ],
-            PackageType="Image",
-            Code=Code(
-                ImageUri=Ref(image_uri),
-            ),
-            ImageConfig=ImageConfig(
-                Command=[
-                    Join(":", (handler.__module__, handler.__name__)),
-                ],
-            ),
+            MemorySize=memory_size,
+            Environment=Environment(Variables=variables),
+            **function_properties,
         ),
     )
 
-    log_group = template.add_resource(
-        LogGroup(
-            "LogGroup",
-            LogGroupName=Join("/", ["/aws/lambda", Ref(function)]),
-            RetentionInDays=7,
+    common.add_warming(template, function, alias, role, warming)
+
+    log_groups = [
+        template.add_resource(
+            LogGroup(
+                "LogGroup",
+                LogGroupName=Join("/", ["/aws/lambda", Ref(function)]),
+                RetentionInDays=7,
+            )
+        )
+    ]
+    for tier_function, _ in tier_functions:
+        log_groups.append(
+            template.add_resource(
+                LogGroup(
+                    f"{tier_function.title}LogGroup",
+                    LogGroupName=Join("/", ["/aws/lambda", Ref(tier_function)]),
+                    RetentionInDays=7,
+                )
+            )
         )
-    )
 
     policy = template.add_resource(
         PolicyType(
@@ -161,15 +357,30 @@ def create_template():
                 Statement=[
                     Statement(
                         Effect=Allow,
-                        Resource=GetAtt(log_group, "Arn"),
+                        Resource=[GetAtt(log_group, "Arn") for log_group in log_groups],
                         Action=[logs.CreateLogStream, logs.PutLogEvents],
                     ),
+                    # scatter invokes the function's own alias, routing the tiers' aliases
+                    Statement(
+                        Effect=Allow,
+                        Resource=[Ref(alias)]
+                        + [Ref(tier_alias) for _, tier_alias in tier_functions],
+                        Action=[awslambda.InvokeFunction],
+                    ),
                 ],
             ),
             Roles=[Ref(role)],
         )
     )
 
+    if deferred_execution:
+        add_deferred_execution(template, alias, role, deferred_queue, deferred_table)
+
+    for idx, event_source in enumerate(event_sources):
+        common.add_event_source_mapping(
+            template, f"EventSourceMapping{idx}", alias, role, event_source
+        )
+
     template.add_output(
         Output(
             "FunctionAliasArn",
@@ -177,4 +388,13 @@ def create_template():
         )
     )
 
+    if memory_tiers:
+        # for client side routing with lambdaplatform.tiers, the main function as the default tier
+        template.add_output(
+            Output(
+                "MemoryTiers",
+                Value=join_tiers([(DEFAULT_TIER, memory_size, 0, Ref(alias))] + tier_entries),
+            )
+        )
+
     return template
@@ -0,0 +1,154 @@
+import json
+import os
+from typing import Mapping, NamedTuple, Optional, Sequence
+
+from .runtime.metrics import increment
+
+# JSON list of the function's memory tiers, set on the function that routes, the tiers' own
+# functions run every invocation they are sent themselves
+TIERS = "LAMBDAPLATFORM_MEMORY_TIERS"
+DEFAULT_QUALIFIER = "latest"
+
+
+class Tier(NamedTuple):
+    name: str
+    memory_size: int
+    # payloads of at least this many bytes are routed here, without a threshold only hints are
+    min_payload_bytes: Optional[int] = None
+    # the tier's alias, None for the routing function itself
+    arn: Optional[str] = None
+
+
+class TierError(Exception):
+    pass
+
+
+def get_hints(client_context: Optional[str]) -> dict:
+    # callers hint via client context custom memoryTier (a name) or memorySize (MB at least)
+    if not client_context:
+        return {}
+    try:
+        custom = json.loads(client_context).get("custom") or {}
+        hints = {}
+        if "memoryTier" in custom:
+            hints["tier"] = str(custom["memoryTier"])
+        if "memorySize" in custom:
+            hints["memory_size"] = int(custom["memorySize"])
+        return hints
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+class Router:
+    def __init__(
+        self,
+        tiers: Sequence[Tier],
+        *,
+        function_name: Optional[str] = None,
+        qualifier: str = DEFAULT_QUALIFIER,
+        environment: Mapping[str, str] = os.environ,
+    ):
+        if not tiers:
+            raise ValueError("A router needs at least one memory tier")
+        self.tiers = sorted(tiers, key=lambda tier: tier.memory_size)
+        self.by_name = {tier.name: tier for tier in self.tiers}
+        # the tier without an ARN is invoked through the routing function's own alias
+        self.function_name = function_name or environment.get("AWS_LAMBDA_FUNCTION_NAME")
+        self.qualifier = qualifier
+
+    @classmethod
+    def from_json(cls, value: str, **kwargs) -> "Router":
+        return cls([Tier(**tier) for tier in json.loads(value)], **kwargs)
+
+    def select(
+        self, payload_size: int, *, tier: Optional[str] = None, memory_size: Optional[int] = None
+    ) -> Tier:
+        if tier is not None:
+            try:
+                return self.by_name[tier]
+            except KeyError:
+                raise LookupError(f"Unknown memory tier {tier!r}") from None
+        if memory_size is not None:
+            # the smallest tier with enough memory, or the largest there is
+            for candidate in self.tiers:
+                if candidate.memory_size >= memory_size:
+                    return candidate
+            return self.tiers[-1]
+        # the tier with the highest threshold the payload reaches, the smallest tier otherwise
+        selected = None
+        for candidate in self.tiers:
+            threshold = candidate.min_payload_bytes
+            if threshold is not None and payload_size >= threshold:
+                if selected is None or threshold >= selected.min_payload_bytes:
+                    selected = candidate
+        return selected or self.tiers[0]
+
+    def route(self, payload: bytes, client_context: Optional[str] = None) -> Optional[Tier]:
+        # the tier to relay an invocation of the routing function to, None to run it here
+        tier = self.select(len(payload), **get_hints(client_context))
+        return tier if tier.arn is not None else None
+
+    def get_client(self):
+        import botocore.config
+
+        from . import clients
+
+        # a synchronous invocation may legitimately take the whole 15 minute maximum
+        return clients.client("lambda", config=botocore.config.Config(read_timeout=905))
+
+    def invoke_tier(
+        self, tier: Tier, payload: bytes, *, client_context: Optional[str] = None
+    ) -> bytes:
+        kwargs = {"FunctionName": tier.arn}
+        if tier.arn is None:
+            if not self.function_name:
+                raise ValueError(f"No function to invoke the {tier.name} tier of")
+            kwargs = {"FunctionName": self.function_name, "Qualifier": self.qualifier}
+        if client_context:
+            import base64
+
+            # passed on so logLevel and the like still apply, the API takes it base64 encoded
+            kwargs["ClientContext"] = base64.b64encode(client_context.encode("utf-8")).decode()
+        response = self.get_client().invoke(Payload=bytes(payload), **kwargs)
+        increment("MemoryTierInvocations")
+        body = response["Payload"].read()
+        if "FunctionError" in response:
+            raise TierError(body.decode("utf-8", "replace"))
+        return body
+
+    def invoke(
+        self,
+        event,
+        *,
+        tier: Optional[str] = None,
+        memory_size: Optional[int] = None,
+        client_context: Optional[dict] = None,
+    ):
+        # client side routing, the chosen tier is invoked directly instead of via the router
+        payload = json.dumps(event).encode("utf-8")
+        selected = self.select(len(payload), tier=tier, memory_size=memory_size)
+        encoded_context = json.dumps(client_context) if client_context else None
+        return json.loads(self.invoke_tier(selected, payload, client_context=encoded_context))
+
+
+def get_router(environment: Mapping[str, str] = os.environ) -> Optional[Router]:
+    value = environment.get(TIERS)
+    if not value:
+        return None
+    return Router.from_json(value, environment=environment)
+
+
+def invoke(
+    event,
+    *,
+    tier: Optional[str] = None,
+    memory_size: Optional[int] = None,
+    client_context: Optional[dict] = None,
+    router: Optional[Router] = None,
+    environment: Mapping[str, str] = os.environ,
+):
+    # from outside the stack, LAMBDAPLATFORM_MEMORY_TIERS is the stack's MemoryTiers output
+    router = router or get_router(environment)
+    if router is None:
+        raise ValueError(f"No memory tiers configured, set {TIERS}")
+    return router.invoke(event, tier=tier, memory_size=memory_size, client_context=client_context)
@@ -0,0 +1,397 @@
+import argparse
+import json
+import math
+import os
+import pathlib
+import re
+import resource
+import signal
+import subprocess
+import sys
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .runtime import ARCHITECTURE, PHASES
+from .runtime.benchmark import percentile
+from .runtime.emulator import RuntimeApiEmulator
+
+# Lambda allocates CPU in proportion to memory, one full vCPU at 1769 MB
+FULL_VCPU_MEMORY_SIZE = 1769
+# the pinned troposphere only accepts sizes in 64 MB increments
+MEMORY_INCREMENT = 64
+MEMORY_SIZES = (128, 256, 512, 768, 1024, 1536, 1792, 2048, 3072, 4096, 6144, 8192, 10240)
+
+# us-east-1 on-demand pricing, only the ratios between sizes and architectures matter
+PRICES_PER_GB_SECOND = {"x86_64": 0.0000166667, "arm64": 0.0000133334}
+PRICE_PER_REQUEST = 0.0000002
+DEFAULT_ARCHITECTURE = "x86_64"
+
+# nested stacks of the primary template whose function MemorySize can be tuned
+TEMPLATE_KEYS = ("AvailabilityZones", "ImageTagger", "LambdaEipAllocator", "LambdaFunction")
+
+
+class Sample(NamedTuple):
+    function: str
+    memory_size: int
+    duration: float
+    billed_duration: float
+    max_rss: Optional[float]
+    cold: bool
+    architecture: str = DEFAULT_ARCHITECTURE
+
+
+class Estimate(NamedTuple):
+    memory_size: int
+    architecture: str
+    measured: bool
+    p50: float
+    p99: float
+    cost_per_million: float
+    feasible: bool
+
+
+def get_template_key(function_name: str) -> str:
+    # CloudFormation names nested stack functions <root>-<NestedStackId>-<suffix>-Function-<suffix>
+    for key in TEMPLATE_KEYS:
+        if f"-{key}-" in function_name or function_name == key:
+            # memory tiers are sized by their own configuration, not the function's
+            tier = re.search(r"-FunctionTier([A-Za-z0-9]+)-", function_name)
+            return f"{key}Tier{tier.group(1)}" if tier else key
+    return function_name
+
+
+def as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def read_samples(
+    lines: Iterable[str],
+    *,
+    default_memory_size: Optional[int] = None,
+    default_architecture: str = DEFAULT_ARCHITECTURE,
+):
+    for line in lines:
+        # tolerate exported log lines that prefix the EMF document with a timestamp or stream
+        start = line.find("{")
+        if start == -1:
+            continue
+        try:
+            document = json.loads(line[start:])
+        except ValueError:
+            continue
+        if not isinstance(document, dict) or "_aws" not in document:
+            continue
+        if "HandlerTime" not in document:
+            continue
+        memory_size = document.get("MemorySize") or default_memory_size
+        if not memory_size:
+            continue
+        architecture = document.get("Architecture") or default_architecture
+        # aggregated documents carry one list entry per invocation
+        phases = [as_list(document.get(name, 0)) for name in PHASES[1:]]
+        count = len(phases[1])
+        cold = as_list(document.get("ColdStart", [0] * count))
+        init = iter(as_list(document.get("InitDuration", [])))
+        max_rss = as_list(document.get("MaxRss", [None] * count))
+        for idx in range(count):
+            duration = sum(phase[idx] for phase in phases if idx < len(phase))
+            is_cold = bool(cold[idx]) if idx < len(cold) else False
+            billed = duration + (next(init, 0) if is_cold else 0)
+            yield Sample(
+                get_template_key(document.get("FunctionName", "local")),
+                int(memory_size),
+                duration,
+                billed,
+                max_rss[idx] if idx < len(max_rss) else None,
+                is_cold,
+                architecture,
+            )
+
+
+def cpu_share(memory_size: int) -> float:
+    return min(memory_size, FULL_VCPU_MEMORY_SIZE) / FULL_VCPU_MEMORY_SIZE
+
+
+def get_cost_per_million(
+    memory_size: int,
+    billed_durations: Sequence[float],
+    architecture: str = DEFAULT_ARCHITECTURE,
+) -> float:
+    gb_seconds = sum(math.ceil(duration) / 1000 for duration in billed_durations) * memory_size
+    price = PRICES_PER_GB_SECOND[architecture]
+    mean = gb_seconds / 1024 / len(billed_durations) * price + PRICE_PER_REQUEST
+    return mean * 1_000_000
+
+
+def estimate(
+    samples: Sequence[Sample],
+    *,
+    candidates: Sequence[int] = MEMORY_SIZES,
+    headroom: float = 1.2,
+    failed: Sequence[int] = (),
+) -> List[Estimate]:
+    # samples of one architecture, estimates of several can be compared by recommend()
+    architecture = samples[0].architecture
+    by_size: Dict[int, List[Sample]] = {}
+    for sample in samples:
+        by_size.setdefault(sample.memory_size, []).append(sample)
+    peaks = [sample.max_rss for sample in samples if sample.max_rss is not None]
+    peak = max(peaks) if peaks else None
+    estimates = []
+    for memory_size in sorted({*candidates, *by_size}):
+        measured = memory_size in by_size
+        if measured:
+            scale = 1.0
+            observed = by_size[memory_size]
+        else:
+            # unmeasured sizes are extrapolated from the closest measured one assuming the handler
+            # is CPU bound and single threaded, measure I/O bound handlers at several sizes instead
+            nearest = min(by_size, key=lambda size: abs(math.log(size / memory_size)))
+            scale = cpu_share(nearest) / cpu_share(memory_size)
+            observed = by_size[nearest]
+        durations = [sample.duration * scale for sample in observed]
+        billed = [sample.billed_duration * scale for sample in observed]
+        estimates.append(
+            Estimate(
+                memory_size,
+                architecture,
+                measured,
+                percentile(durations, 50),
+                percentile(durations, 99),
+                get_cost_per_million(memory_size, billed, architecture),
+                memory_size % MEMORY_INCREMENT == 0
+                and memory_size not in failed
+                and (peak is None or peak * headroom <= memory_size),
+            )
+        )
+    return estimates
+
+
+def recommend(estimates: Sequence[Estimate], strategy: str) -> Optional[Estimate]:
+    feasible = [estimate for estimate in estimates if estimate.feasible]
+    if not feasible:
+        return None
+    if strategy == "speed":
+        return min(
+            feasible, key=lambda estimate: (round(estimate.p99, 1), estimate.cost_per_million)
+        )
+    return min(feasible, key=lambda estimate: (estimate.cost_per_million, estimate.p99))
+
+
+class CpuThrottle(threading.Thread):
+    # approximates Lambda's fractional vCPU by stopping and continuing the process in a duty cycle
+    def __init__(self, pid: int, share: float, *, period: float = 0.02):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.share = share
+        self.period = period
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.share * self.period):
+                os.kill(self.pid, signal.SIGSTOP)
+                self.stopped.wait((1 - self.share) * self.period)
+                os.kill(self.pid, signal.SIGCONT)
+        except ProcessLookupError:
+            pass
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        try:
+            os.kill(self.pid, signal.SIGCONT)
+        except ProcessLookupError:
+            pass
+
+
+def emulate(
+    handler: str,
+    payloads: Sequence[bytes],
+    memory_size: int,
+    *,
+    function: str,
+    invocations: int,
+    runtime_args: Sequence[str] = (),
+    environment: Dict[str, str] = os.environ,
+):
+    def limit_memory():
+        # RLIMIT_DATA covers the heap and anonymous mappings, close to what Lambda's cgroup counts
+        limit = memory_size * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+    with RuntimeApiEmulator() as emulator:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "lambdaplatform.runtime", handler, "--memory", *runtime_args],
+            env={
+                **environment,
+                "AWS_LAMBDA_RUNTIME_API": emulator.address,
+                "AWS_LAMBDA_FUNCTION_NAME": function,
+                "AWS_LAMBDA_FUNCTION_MEMORY_SIZE": str(memory_size),
+                "LAMBDAPLATFORM_METRICS_FLUSH_EVERY": "1",
+            },
+            stdout=subprocess.PIPE,
+            text=True,
+            preexec_fn=limit_memory,
+        )
+        throttle = None
+        if cpu_share(memory_size) < 1:
+            throttle = CpuThrottle(process.pid, cpu_share(memory_size))
+            throttle.start()
+        try:
+            failed = False
+            for idx in range(invocations):
+                invocation = emulator.submit(payloads[idx % len(payloads)])
+                # a runtime killed by the memory limit never completes its invocation
+                while not invocation.done.wait(0.1) and process.poll() is None:
+                    pass
+                failed = not invocation.done.is_set() or invocation.error is not None
+                if failed:
+                    break
+        finally:
+            if throttle is not None:
+                throttle.stop()
+            process.kill()
+            output, _ = process.communicate()
+    return output.splitlines(), failed
+
+
+def format_estimates(function: str, estimates: Sequence[Estimate], chosen: Optional[Estimate]):
+    lines = [
+        function,
+        f"{'memory':>8} {'arch':>7} {'p50 ms':>9} {'p99 ms':>9} {'$/1M inv':>9}  source",
+    ]
+    for estimate in estimates:
+        marker = "*" if estimate == chosen else " "
+        source = "measured" if estimate.measured else "extrapolated"
+        if not estimate.feasible:
+            source += ", not usable"
+        lines.append(
+            f"{marker}{estimate.memory_size:>7} {estimate.architecture:>7} "
+            f"{estimate.p50:>9.3f} {estimate.p99:>9.3f} "
+            f"{estimate.cost_per_million:>9.3f}  {source}"
+        )
+    return "\n".join(lines)
+
+
+def update_json(path: pathlib.Path, values: Dict):
+    current = json.loads(path.read_text()) if path.exists() else {}
+    current.update(values)
+    path.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+
+
+def get_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Recommend MemorySize per function from runtime --memory metrics",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("metrics", nargs="*", type=pathlib.Path, help="Recorded EMF log lines")
+    parser.add_argument("--strategy", choices=["cost", "speed"], default="cost")
+    parser.add_argument(
+        "--headroom", type=float, default=1.2, help="Required MemorySize over peak RSS"
+    )
+    parser.add_argument(
+        "--default-memory-size",
+        type=int,
+        help="MemorySize of recorded documents that do not carry one",
+    )
+    parser.add_argument(
+        "--default-architecture",
+        choices=sorted(PRICES_PER_GB_SECOND),
+        default=DEFAULT_ARCHITECTURE,
+        help="Architecture of recorded documents that do not carry one",
+    )
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        help="JSON file of MemorySize per template to update, see generate-templates",
+    )
+    parser.add_argument(
+        "--architectures-output",
+        type=pathlib.Path,
+        help="JSON file of architecture per template to update, for functions measured on both",
+    )
+    emulation = parser.add_argument_group("emulation", "Measure a handler on the local emulator")
+    emulation.add_argument("--emulate", metavar="HANDLER")
+    emulation.add_argument("--function", default="LambdaFunction", help="Template key to tune")
+    emulation.add_argument("--events", nargs="+", type=pathlib.Path, default=[])
+    emulation.add_argument("--invocations", type=int, default=20)
+    emulation.add_argument(
+        "--memory-sizes", nargs="+", type=int, default=[128, 256, 512, 1024, 1792]
+    )
+    emulation.add_argument(
+        "--save-metrics",
+        type=pathlib.Path,
+        help="Append the emulated metrics here, to compare with a run on another architecture",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = get_args(argv)
+    samples: List[Sample] = []
+    failed: Dict[Tuple[str, str], List[int]] = {}
+    for path in args.metrics:
+        with path.open("r") as f:
+            samples.extend(
+                read_samples(
+                    f,
+                    default_memory_size=args.default_memory_size,
+                    default_architecture=args.default_architecture,
+                )
+            )
+    if args.emulate:
+        payloads = [path.read_bytes() for path in args.events] or [b"{}"]
+        for memory_size in args.memory_sizes:
+            lines, size_failed = emulate(
+                args.emulate,
+                payloads,
+                memory_size,
+                function=args.function,
+                invocations=args.invocations,
+            )
+            samples.extend(read_samples(lines))
+            if args.save_metrics:
+                with args.save_metrics.open("a") as f:
+                    f.writelines(f"{line}\n" for line in lines)
+            if size_failed:
+                failed.setdefault((args.function, ARCHITECTURE), []).append(memory_size)
+
+    by_function: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_function.setdefault(sample.function, []).append(sample)
+    recommendations = {}
+    architectures = {}
+    for function, function_samples in sorted(by_function.items()):
+        by_architecture: Dict[str, List[Sample]] = {}
+        for sample in function_samples:
+            by_architecture.setdefault(sample.architecture, []).append(sample)
+        estimates: List[Estimate] = []
+        for architecture, architecture_samples in sorted(by_architecture.items()):
+            estimates.extend(
+                estimate(
+                    architecture_samples,
+                    headroom=args.headroom,
+                    failed=failed.get((function, architecture), ()),
+                )
+            )
+        chosen = recommend(estimates, args.strategy)
+        print(format_estimates(function, estimates, chosen), end="\n\n")
+        if chosen is not None:
+            recommendations[function] = chosen.memory_size
+            # measurements on one architecture say nothing about the other
+            if len(by_architecture) > 1:
+                architectures[function] = chosen.architecture
+
+    if args.output:
+        update_json(args.output, recommendations)
+    else:
+        print(json.dumps(recommendations, sort_keys=True))
+    if args.architectures_output:
+        update_json(args.architectures_output, architectures)
+    elif architectures:
+        print(json.dumps(architectures, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
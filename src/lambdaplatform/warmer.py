@@ -0,0 +1,62 @@
+import os
+import time
+from typing import Mapping
+
+from .runtime.metrics import increment
+
+# scheduled pings carrying this key are answered by the runtime before the handler is looked at
+EVENT_KEY = "lambdaplatform.warm"
+# long enough for all pings to be in flight at once, so each is served by a container of its own
+DEFAULT_HOLD = 0.25
+MAX_HOLD = 5.0
+# set by the templates for functions warming containers, pings are ignored by all others
+CONTAINERS = "LAMBDAPLATFORM_WARM_CONTAINERS"
+MAX_CONTAINERS = 100
+
+
+def is_warm_event(event) -> bool:
+    return isinstance(event, dict) and EVENT_KEY in event
+
+
+def get_event(containers: int, *, hold: float = DEFAULT_HOLD) -> dict:
+    return {EVENT_KEY: {"containers": containers, "hold": hold}}
+
+
+def hold(seconds: float):
+    time.sleep(min(max(0.0, seconds), MAX_HOLD))
+
+
+def register():
+    from . import scatter
+
+    # the pings fanned out to other containers run hold as a scatter task, it is registered at
+    # init rather than on import, scatter imports the runtime which imports this module, and only
+    # functions warming several containers pay for importing scatter
+    scatter.task(hold)
+
+
+def get_containers(environment: Mapping[str, str] = os.environ) -> int:
+    return min(int(environment.get(CONTAINERS) or 0), MAX_CONTAINERS)
+
+
+def handle(event, *, environment: Mapping[str, str] = os.environ) -> dict:
+    # the event can only ask for fewer containers than configured, never for more
+    configured = get_containers(environment)
+    if not configured:
+        return {"containers": 0}
+    request = event[EVENT_KEY] or {}
+    containers = max(1, min(int(request.get("containers", configured)), configured))
+    seconds = min(max(0.0, float(request.get("hold", DEFAULT_HOLD))), MAX_HOLD)
+    increment("WarmPings")
+    if containers > 1:
+        from . import scatter
+
+        register()
+        # this container counts as one, it is kept busy until the other pings have returned
+        backend = scatter.LambdaBackend(max_concurrency=containers - 1, environment=environment)
+        try:
+            backend.run(scatter.get_task_name(hold), [[seconds]] * (containers - 1))
+        except scatter.ScatterError:
+            # warming is best effort, a failed ping must not be retried as a failed invocation
+            increment("WarmFailures")
+    return {"containers": containers}